@@ -3,6 +3,8 @@ import os
 def _reload_modules():
     from importlib import reload
     from . import operators
+    from . import anim_utils
+    from . import bake_pool
     from . import bone_utils
     from . import preferences
     from . import preset_handler
@@ -11,6 +13,8 @@ def _reload_modules():
 
     from .rig_mapping import bone_mapping
 
+    reload(anim_utils)
+    reload(bake_pool)
     reload(operators)
     reload(bone_utils)
     reload(preferences)
@@ -0,0 +1,694 @@
+import bpy
+import numpy
+from mathutils import Matrix
+
+
+def get_rot_ani_path(to_animate):
+    if to_animate.rotation_mode == 'QUATERNION':
+        return 'rotation_quaternion', 4
+    if to_animate.rotation_mode == 'AXIS_ANGLE':
+        return 'rotation_axis_angle', 4
+
+    return 'rotation_euler', 3
+
+
+def pose_bone_path(bone_name, prop):
+    """Return the data path of a pose bone property, i.e. 'pose.bones["Hips"].location'"""
+    bone_name = bone_name.replace('\\', '\\\\').replace('"', '\\"')
+    return 'pose.bones["{}"].{}'.format(bone_name, prop)
+
+
+def visual_transform(ob, pose_bone):
+    """Return the basis matrix reproducing the current (constrained) pose of pose_bone"""
+    return ob.convert_space(pose_bone=pose_bone, matrix=pose_bone.matrix, from_space='POSE', to_space='LOCAL')
+
+
+TRANSFORM_CHANNELS = ('location', 'rotation', 'scale')
+
+# transform channels changed by each constraint type, those missing may change all of them
+CONSTRAINT_CHANNELS = {
+    'COPY_LOCATION': {'location'},
+    'LIMIT_LOCATION': {'location'},
+    'LIMIT_DISTANCE': {'location'},
+    'COPY_ROTATION': {'rotation'},
+    'LIMIT_ROTATION': {'rotation'},
+    'DAMPED_TRACK': {'rotation'},
+    'LOCKED_TRACK': {'rotation'},
+    'TRACK_TO': {'rotation'},
+    'COPY_SCALE': {'scale'},
+    'LIMIT_SCALE': {'scale'},
+    'MAINTAIN_VOLUME': {'scale'},
+}
+
+CONSTANT_TOLERANCE = 1e-6
+
+
+def has_ik(ob):
+    """Return True if ob has IK constraints, which move bones other than their owners"""
+    return any(constr.type in ('IK', 'SPLINE_IK') and not constr.mute
+               for pb in ob.pose.bones for constr in pb.constraints)
+
+
+def moving_channels(ob, pose_bone):
+    """Return the transform channels of pose_bone that its constraints or drivers can change,
+    among 'location', 'rotation' and 'scale'. The others keep the value of the pose bone
+    """
+    if ob.animation_data:
+        bone_path = pose_bone_path(pose_bone.name, "")
+        if any(driver.data_path.startswith(bone_path) for driver in ob.animation_data.drivers):
+            return set(TRANSFORM_CHANNELS)
+
+    channels = set()
+    for constr in pose_bone.constraints:
+        if constr.mute:
+            continue
+        try:
+            channels.update(CONSTRAINT_CHANNELS[constr.type])
+        except KeyError:
+            return set(TRANSFORM_CHANNELS)
+
+    return channels
+
+
+def matrices_to_channels(matrices, rotation_mode, channels=TRANSFORM_CHANNELS):
+    """Decompose basis matrices into location, rotation and scale channels, or only the given ones.
+
+    Rotations are kept continuous from one frame to the next, as keyframe baking does.
+    Return a list of (property name, [values per frame]) pairs
+    """
+    locations = []
+    rotations = []
+    scales = []
+
+    prev_rot = None
+    for mat in matrices:
+        loc, quat, scale = mat.decompose()
+
+        if 'rotation' not in channels:
+            pass
+        elif rotation_mode == 'QUATERNION':
+            if prev_rot is not None and quat.dot(prev_rot) < 0.0:
+                quat.negate()
+            prev_rot = quat
+            rotations.append(quat[:])
+        elif rotation_mode == 'AXIS_ANGLE':
+            axis, angle = quat.to_axis_angle()
+            rotations.append((angle, axis[0], axis[1], axis[2]))
+        else:
+            if prev_rot is None:
+                prev_rot = quat.to_euler(rotation_mode)
+            else:
+                prev_rot = quat.to_euler(rotation_mode, prev_rot)
+            rotations.append(prev_rot[:])
+
+        locations.append(loc[:])
+        scales.append(scale[:])
+
+    rot_path = 'rotation_euler'
+    if rotation_mode == 'QUATERNION':
+        rot_path = 'rotation_quaternion'
+    elif rotation_mode == 'AXIS_ANGLE':
+        rot_path = 'rotation_axis_angle'
+
+    result = [('location', locations), (rot_path, rotations), ('scale', scales)]
+    return [(prop, values) for channel, (prop, values) in zip(TRANSFORM_CHANNELS, result) if channel in channels]
+
+
+def ensure_fcurve(action, ob, data_path, index, group_name=""):
+    """Return the F-Curve animating data_path[index] of ob in action, create it if missing"""
+    try:
+        # layered actions (Blender 4.4+): ob must use action already
+        return action.fcurve_ensure_for_datablock(ob, data_path, index=index, group_name=group_name)
+    except AttributeError:
+        pass
+
+    for fc in action.fcurves:
+        if fc.data_path == data_path and fc.array_index == index:
+            return fc
+
+    return action.fcurves.new(data_path, index=index, action_group=group_name)
+
+
+def set_fcurve_keys(fcurve, frames, values):
+    """Append keyframes to fcurve in bulk, frames and values are sequences of the same length"""
+    count = len(frames)
+    if not count:
+        return
+
+    co = numpy.empty(2 * count, dtype=numpy.float32)
+    co[0::2] = frames
+    co[1::2] = values
+
+    key_points = fcurve.keyframe_points
+    key_points.add(count)
+    key_points.foreach_set('co', co)
+    # baked keys are one per frame, new keys would be BEZIER with auto handles
+    _set_linear(fcurve)
+    fcurve.update()
+
+
+def write_channels(action, ob, pose_bone, frames, channels, only_moving=False):
+    """Write the (property name, [values per frame]) pairs of pose_bone to action.
+
+    With only_moving, constant channels get a single key
+    """
+    for prop, prop_values in channels:
+        data_path = pose_bone_path(pose_bone.name, prop)
+        for index, values in enumerate(zip(*prop_values)):
+            key_frames = frames
+            if only_moving:
+                values = numpy.asarray(values)
+                if values.max() - values.min() <= CONSTANT_TOLERANCE:
+                    key_frames = frames[:1]
+                    values = values[:1]
+
+            fc = ensure_fcurve(action, ob, data_path, index, group_name=pose_bone.name)
+            set_fcurve_keys(fc, key_frames, values)
+
+
+def iter_bake_actions(context, to_bake, frame_start, frame_end, only_moving=False):
+    """Bake the visual transforms of several armatures in a single timeline sweep, one frame per step.
+
+    to_bake is a list of (armature object, bone names, new action name).
+    With only_moving, channels that no constraint or driver can change are sampled at the first frame only
+    and constant channels get a single key.
+    Yield after each sampled frame, so that the bake can be time sliced or interrupted;
+    the new actions are written when the sweep is over, assigned to their objects and returned in order.
+    If the generator is closed early, no action is created and the previous ones are restored
+    """
+    scene = context.scene
+    frame_current = scene.frame_current
+
+    bake_items = []
+    prev_actions = []
+    for ob, bone_names, _ in to_bake:
+        if not ob.animation_data:
+            ob.animation_data_create()
+        prev_actions.append(ob.animation_data.action)
+        # keys from a previous bake would leak into unconstrained channels
+        ob.animation_data.action = None
+
+        pose_bones = [ob.pose.bones[b_name] for b_name in bone_names if b_name in ob.pose.bones]
+        sampled = []
+        static = []
+        if only_moving and not has_ik(ob):
+            for pb in pose_bones:
+                moving = moving_channels(ob, pb)
+                if moving:
+                    sampled.append((pb, moving))
+                if len(moving) < len(TRANSFORM_CHANNELS):
+                    static.append((pb, [ch for ch in TRANSFORM_CHANNELS if ch not in moving]))
+        else:
+            sampled = [(pb, TRANSFORM_CHANNELS) for pb in pose_bones]
+
+        bake_items.append((ob, sampled, [[] for _ in sampled], static, []))
+
+    frames = list(range(frame_start, frame_end + 1))
+    try:
+        for frame in frames:
+            scene.frame_set(frame)
+            for ob, sampled, bone_matrices, static, static_matrices in bake_items:
+                for (pb, _), matrices in zip(sampled, bone_matrices):
+                    matrices.append(visual_transform(ob, pb))
+                if frame == frame_start:
+                    static_matrices.extend(visual_transform(ob, pb) for pb, _ in static)
+            yield frame
+    except GeneratorExit:
+        for (ob, _, _, _, _), action in zip(bake_items, prev_actions):
+            ob.animation_data.action = action
+        raise
+    finally:
+        scene.frame_set(frame_current)
+
+    actions = []
+    for (ob, sampled, bone_matrices, static, static_matrices), (_, _, action_name) in zip(bake_items, to_bake):
+        action = bpy.data.actions.new(action_name)
+        ob.animation_data.action = action
+
+        for (pb, channels), matrices in zip(sampled, bone_matrices):
+            write_channels(action, ob, pb, frames, matrices_to_channels(matrices, pb.rotation_mode, channels),
+                           only_moving)
+        for (pb, static_channels), matrix in zip(static, static_matrices):
+            write_channels(action, ob, pb, frames[:1],
+                           matrices_to_channels([matrix], pb.rotation_mode, static_channels), True)
+
+        if only_moving:
+            # constant channels have a single key, keep the range of the bake
+            try:
+                action.frame_start = frame_start
+                action.frame_end = frame_end
+                action.use_frame_range = True
+            except AttributeError:
+                # before blender 3.1
+                pass
+
+        actions.append(action)
+
+    return actions
+
+
+def bake_actions(context, to_bake, frame_start, frame_end, only_moving=False):
+    """Bake the visual transforms of several armatures in a single timeline sweep.
+
+    to_bake is a list of (armature object, bone names, new action name).
+    The scene is evaluated once per frame for all of them, then each F-Curve is written at once.
+    The new actions are assigned to their objects and returned in the same order
+    """
+    steps = iter_bake_actions(context, to_bake, frame_start, frame_end, only_moving)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def bake_action(context, ob, bone_names, frame_start, frame_end, action_name="Action", only_moving=False):
+    """Bake the visual transforms of the given pose bones to a new action, assigned to ob and returned"""
+    return bake_actions(context, [(ob, bone_names, action_name)], frame_start, frame_end, only_moving)[0]
+
+
+def simplify_keys(frames, values, tolerance):
+    """Return the indices of the keys to keep, so that linear interpolation between them
+    stays within tolerance from the dropped values (Ramer-Douglas-Peucker on the value error)
+    """
+    count = len(values)
+    keep = numpy.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    segments = [(0, count - 1)]
+    while segments:
+        first, last = segments.pop()
+        if last - first < 2:
+            continue
+
+        factors = (frames[first + 1:last] - frames[first]) / (frames[last] - frames[first])
+        interpolated = values[first] + factors * (values[last] - values[first])
+        errors = numpy.abs(values[first + 1:last] - interpolated)
+
+        worst = int(errors.argmax())
+        if errors[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            segments.append((first, split))
+            segments.append((split, last))
+
+    return numpy.flatnonzero(keep)
+
+
+def _clear_keys(fcurve):
+    key_points = fcurve.keyframe_points
+    try:
+        key_points.clear()
+    except AttributeError:
+        # before blender 3.0
+        for key_point in reversed(key_points):
+            key_points.remove(key_point, fast=True)
+
+
+def _set_linear(fcurve):
+    key_points = fcurve.keyframe_points
+    linear = key_points[0].bl_rna.properties['interpolation'].enum_items['LINEAR'].value
+    try:
+        key_points.foreach_set('interpolation', [linear] * len(key_points))
+    except (TypeError, RuntimeError):
+        for key_point in key_points:
+            key_point.interpolation = 'LINEAR'
+
+
+def reduce_fcurve(fcurve, tolerance):
+    """Replace the keys of fcurve with the fewest linear keys that stay within tolerance from the current keys.
+
+    Only frames that are already keyed are kept. Return the key count before and after reduction, and the max error
+    """
+    count = len(fcurve.keyframe_points)
+    if count < 3:
+        return count, count, 0.0
+
+    co = numpy.empty(2 * count, dtype=numpy.float32)
+    fcurve.keyframe_points.foreach_get('co', co)
+    frames = co[0::2].astype(numpy.float64)
+    values = co[1::2].astype(numpy.float64)
+
+    kept = simplify_keys(frames, values, tolerance)
+    if len(kept) >= count:
+        return count, count, 0.0
+
+    max_error = float(numpy.abs(numpy.interp(frames, frames[kept], values[kept]) - values).max())
+
+    _clear_keys(fcurve)
+    set_fcurve_keys(fcurve, frames[kept], values[kept])
+
+    return count, len(kept), max_error
+
+
+def update_hash_fcurves(hasher, fcurves):
+    """Feed data paths and keyframes of the given F-Curves to hasher"""
+    for fc in fcurves:
+        count = len(fc.keyframe_points)
+        hasher.update("{}[{}]:{}".format(fc.data_path, fc.array_index, count).encode())
+
+        co = numpy.empty(2 * count, dtype=numpy.float32)
+        fc.keyframe_points.foreach_get('co', co)
+        hasher.update(co.tobytes())
+
+
+def update_hash_rna(hasher, struct):
+    """Feed the editable settings of struct (i.e. a constraint) to hasher"""
+    for prop in struct.bl_rna.properties:
+        if prop.is_readonly or prop.identifier in ('rna_type', 'show_expanded', 'active'):
+            continue
+
+        value = getattr(struct, prop.identifier)
+        if isinstance(value, bpy.types.ID):
+            value = value.name
+        elif isinstance(value, set):
+            value = sorted(value)
+        elif prop.type in ('BOOLEAN', 'INT', 'FLOAT') and prop.array_length:
+            value = value[:]
+
+        hasher.update("{}={!r};".format(prop.identifier, value).encode())
+
+
+def update_hash_bone(hasher, ob, bone_name):
+    """Feed rest matrix, parent chain, inheritance and constraints of a bone to hasher"""
+    bone = ob.data.bones[bone_name]
+    try:
+        inherit_scale = bone.inherit_scale
+    except AttributeError:
+        # blender < 2.81
+        inherit_scale = bone.use_inherit_scale
+    hasher.update(repr((bone_name, bone.matrix_local[:], [parent.name for parent in bone.parent_recursive],
+                        bone.use_inherit_rotation, bone.use_local_location, inherit_scale)).encode())
+
+    for constr in ob.pose.bones[bone_name].constraints:
+        target = getattr(constr, 'target', None)
+        hasher.update(repr((constr.type, target.name if target else "",
+                            getattr(constr, 'subtarget', ""))).encode())
+        update_hash_rna(hasher, constr)
+
+
+OBJECT_TRANSFORM_PATHS = ('location', 'rotation_euler', 'rotation_quaternion', 'rotation_axis_angle', 'scale',
+                          'delta_location', 'delta_rotation_euler', 'delta_rotation_quaternion', 'delta_scale')
+
+
+def update_hash_object(hasher, ob, animated_paths=()):
+    """Feed parenting, constraints and the transform channels of ob that are not in animated_paths to hasher"""
+    parent = ob.parent
+    hasher.update(repr((parent.name if parent else "", ob.parent_type, ob.parent_bone,
+                        ob.matrix_parent_inverse[:], ob.rotation_mode)).encode())
+    if parent:
+        hasher.update(repr(parent.matrix_world[:]).encode())
+
+    for path in OBJECT_TRANSFORM_PATHS:
+        if path not in animated_paths:
+            hasher.update("{}={!r};".format(path, getattr(ob, path)[:]).encode())
+
+    for constr in ob.constraints:
+        update_hash_rna(hasher, constr)
+
+
+def replace_fcurve_keys(fcurve, frames, values):
+    """Replace the keys of fcurve in the range of frames with the given values, in bulk"""
+    count = len(fcurve.keyframe_points)
+    if count:
+        co = numpy.empty(2 * count, dtype=numpy.float32)
+        fcurve.keyframe_points.foreach_get('co', co)
+        old_frames = co[0::2]
+        outside = (old_frames < frames[0]) | (old_frames > frames[-1])
+
+        if outside.any():
+            frames = numpy.concatenate((old_frames[outside], frames))
+            values = numpy.concatenate((co[1::2][outside], values))
+            order = numpy.argsort(frames, kind='stable')
+            frames = frames[order]
+            values = values[order]
+
+        _clear_keys(fcurve)
+
+    set_fcurve_keys(fcurve, frames, values)
+
+
+def matrix_array(matrices):
+    """Return a sequence of 4x4 matrices as a (N, 4, 4) array"""
+    return numpy.array([[row[:] for row in mat] for mat in matrices], dtype=numpy.float64).reshape(-1, 4, 4)
+
+
+def _normalized(vectors):
+    return vectors / numpy.linalg.norm(vectors, axis=1)[:, numpy.newaxis]
+
+
+def root_motion_matrices(hip_mats, root_mats, offset_mat, copy_loc, loc_min, loc_max, copy_rot):
+    """Return the root matrices that follow the hips, as a (N, 4, 4) array.
+
+    hip_mats and root_mats are (N, 4, 4) arrays of the hips and current root matrices, offset_mat is applied to the hips.
+    copy_loc are three bools, the location axes to copy from the hips, the others keep the root location.
+    loc_min and loc_max are three floats or None per axis, to clamp the copied location.
+    copy_rot are three bools, the rotation axes to copy: with two of them rotation is projected
+    on their plane, with less than two it is dropped
+    """
+    mats = numpy.matmul(hip_mats, offset_mat)
+
+    for axis in range(3):
+        if not copy_loc[axis]:
+            mats[:, axis, 3] = root_mats[:, axis, 3]
+            continue
+        if loc_min[axis] is not None:
+            mats[:, axis, 3] = numpy.maximum(mats[:, axis, 3], loc_min[axis])
+        if loc_max[axis] is not None:
+            mats[:, axis, 3] = numpy.minimum(mats[:, axis, 3], loc_max[axis])
+
+    mats[:, 3] = (0.0, 0.0, 0.0, 1.0)
+    if all(copy_rot):
+        return mats
+
+    if sum(copy_rot) < 2:
+        # need at least two axis to make this work, don't use rotation
+        mats[:, :3, :3] = numpy.identity(3)
+        return mats
+
+    # matrix columns are the axes
+    root_axes = root_mats[:, :3, :3]
+    if not copy_rot[2]:
+        # XY plane
+        y_axis = mats[:, :3, 1].copy()
+        y_axis[:, 2] = root_axes[:, 2, 1]
+        y_axis = _normalized(y_axis)
+
+        x_axis = _normalized(numpy.cross(y_axis, root_axes[:, :, 2]))
+        z_axis = _normalized(numpy.cross(x_axis, y_axis))
+    else:
+        z_axis = mats[:, :3, 2].copy()
+        if not copy_rot[0]:
+            # ZY plane
+            z_axis[:, 0] = root_axes[:, 0, 2]
+        else:
+            # XZ plane
+            z_axis[:, 1] = root_axes[:, 1, 2]
+        z_axis = _normalized(z_axis)
+
+        x_axis = _normalized(numpy.cross(root_axes[:, :, 1], z_axis))
+        y_axis = _normalized(numpy.cross(z_axis, x_axis))
+
+    mats[:, :3, 0] = x_axis
+    mats[:, :3, 1] = y_axis
+    mats[:, :3, 2] = z_axis
+
+    return mats
+
+
+def pose_to_basis(pose_mats, rest, parent_pose_mats=None, parent_rest=None):
+    """Return the basis matrices giving the (N, 4, 4) armature space pose_mats to a bone,
+    given its rest matrix_local and the pose and rest matrices of its parent, if any.
+
+    Assumes the bone inherits rotation and scale from its parent and uses local location
+    """
+    if parent_pose_mats is None:
+        return numpy.matmul(numpy.linalg.inv(rest), pose_mats)
+
+    rest_offset = numpy.matmul(numpy.linalg.inv(parent_rest), rest)
+    return numpy.matmul(numpy.linalg.inv(numpy.matmul(parent_pose_mats, rest_offset)), pose_mats)
+
+
+def write_transform_keys(action, ob, frames, basis_mats, rotation_mode, bone_name=""):
+    """Replace the location and rotation keys of ob, or of one of its bones, with those of basis_mats.
+
+    Return the F-Curves that were written
+    """
+    matrices = [Matrix(mat) for mat in basis_mats.tolist()]
+    frames = numpy.asarray(frames, dtype=numpy.float64)
+    fcurves = []
+
+    for prop, prop_values in matrices_to_channels(matrices, rotation_mode, ('location', 'rotation')):
+        if bone_name:
+            data_path = pose_bone_path(bone_name, prop)
+        else:
+            data_path = prop
+        for index, values in enumerate(zip(*prop_values)):
+            fc = ensure_fcurve(action, ob, data_path, index, group_name=bone_name or "Object Transforms")
+            replace_fcurve_keys(fc, frames, numpy.asarray(values, dtype=numpy.float64))
+            fcurves.append(fc)
+
+    return fcurves
+
+
+def evaluate_fcurve(fcurve, frames):
+    """Return the values of fcurve at frames, as an array"""
+    key_points = fcurve.keyframe_points
+    count = len(key_points)
+    if count and not fcurve.modifiers and fcurve.extrapolation == 'CONSTANT':
+        linear = key_points[0].bl_rna.properties['interpolation'].enum_items['LINEAR'].value
+        interpolations = numpy.empty(count, dtype=numpy.int32)
+        key_points.foreach_get('interpolation', interpolations)
+
+        if (interpolations[:-1] == linear).all():
+            co = numpy.empty(2 * count, dtype=numpy.float32)
+            key_points.foreach_get('co', co)
+            return numpy.interp(frames, co[0::2], co[1::2])
+
+    return numpy.array([fcurve.evaluate(frame) for frame in frames], dtype=numpy.float64)
+
+
+def channel_values(fcurves, data_path, current, frames):
+    """Return the (N, len(current)) values of a transform property at frames.
+
+    fcurves maps (data path, index) to F-Curves, channels without F-Curve keep their current value
+    """
+    values = numpy.empty((len(frames), len(current)), dtype=numpy.float64)
+    for index, value in enumerate(current):
+        fc = fcurves.get((data_path, index))
+        if fc and not fc.mute and (len(fc.keyframe_points) or len(fc.modifiers)):
+            values[:, index] = evaluate_fcurve(fc, frames)
+        else:
+            values[:, index] = value
+
+    return values
+
+
+def _axis_rotations(axis, angles):
+    cos = numpy.cos(angles)
+    sin = numpy.sin(angles)
+    mats = numpy.zeros((len(angles), 3, 3))
+
+    i = 'XYZ'.index(axis)
+    j, k = (i + 1) % 3, (i + 2) % 3
+    mats[:, i, i] = 1.0
+    mats[:, j, j] = cos
+    mats[:, j, k] = -sin
+    mats[:, k, j] = sin
+    mats[:, k, k] = cos
+
+    return mats
+
+
+def rotation_matrices(values, rotation_mode):
+    """Return the (N, 3, 3) rotation matrices of (N, 3) euler or (N, 4) quaternion and axis angle values"""
+    if rotation_mode == 'QUATERNION':
+        quats = _normalized(values)
+        w, x, y, z = quats.T
+        return numpy.stack((
+            numpy.stack((1.0 - 2.0 * (y * y + z * z), 2.0 * (x * y - w * z), 2.0 * (x * z + w * y)), axis=-1),
+            numpy.stack((2.0 * (x * y + w * z), 1.0 - 2.0 * (x * x + z * z), 2.0 * (y * z - w * x)), axis=-1),
+            numpy.stack((2.0 * (x * z - w * y), 2.0 * (y * z + w * x), 1.0 - 2.0 * (x * x + y * y)), axis=-1),
+        ), axis=1)
+
+    if rotation_mode == 'AXIS_ANGLE':
+        angles = values[:, 0]
+        axes = values[:, 1:]
+        lengths = numpy.linalg.norm(axes, axis=1)
+        # zero length axes give no rotation
+        angles = numpy.where(lengths > 0.0, angles, 0.0)
+        axes = axes / numpy.where(lengths > 0.0, lengths, 1.0)[:, numpy.newaxis]
+
+        cos = numpy.cos(angles)[:, numpy.newaxis, numpy.newaxis]
+        sin = numpy.sin(angles)[:, numpy.newaxis, numpy.newaxis]
+        cross = numpy.zeros((len(values), 3, 3))
+        cross[:, 0, 1] = -axes[:, 2]
+        cross[:, 0, 2] = axes[:, 1]
+        cross[:, 1, 0] = axes[:, 2]
+        cross[:, 1, 2] = -axes[:, 0]
+        cross[:, 2, 0] = -axes[:, 1]
+        cross[:, 2, 1] = axes[:, 0]
+
+        return cos * numpy.identity(3) + sin * cross + (1.0 - cos) * numpy.einsum('ni,nj->nij', axes, axes)
+
+    # euler: first axis of the rotation mode is applied first
+    mats = None
+    for axis in rotation_mode:
+        axis_mats = _axis_rotations(axis, values[:, 'XYZ'.index(axis)])
+        mats = axis_mats if mats is None else numpy.matmul(axis_mats, mats)
+
+    return mats
+
+
+def compose_matrices(locations, rotations, scales):
+    """Return the (N, 4, 4) matrices of (N, 3) locations, (N, 3, 3) rotations and (N, 3) scales"""
+    mats = numpy.zeros((len(locations), 4, 4))
+    mats[:, :3, :3] = rotations * scales[:, numpy.newaxis, :]
+    mats[:, :3, 3] = locations
+    mats[:, 3, 3] = 1.0
+
+    return mats
+
+
+def motion_fingerprint(matrices):
+    """Return a fingerprint of the motion in (N, 4, 4) matrices, for comparison between clips.
+
+    The distance travelled between samples, relative to the whole path, and the angle turned
+    don't depend on axes orientation, units or rest pose, so curves read from a file
+    can be compared to those of an imported action
+    """
+    steps = numpy.linalg.norm(numpy.diff(matrices[:, :3, 3], axis=0), axis=1)
+    path_length = steps.sum()
+    if path_length > CONSTANT_TOLERANCE:
+        steps /= path_length
+
+    # without scale
+    rotations = matrices[:, :3, :3]
+    rotations = rotations / numpy.linalg.norm(rotations, axis=1)[:, numpy.newaxis, :]
+    relative = numpy.einsum('nji,njk->nik', rotations[:-1], rotations[1:])
+    cos_angles = (numpy.trace(relative, axis1=1, axis2=2) - 1.0) / 2.0
+    angles = numpy.arccos(numpy.clip(cos_angles, -1.0, 1.0))
+
+    return numpy.concatenate((steps, angles))
+
+
+def transform_basis_matrices(owner, fcurves, frames, path_prefix=""):
+    """Return the (N, 4, 4) basis matrices of an object or pose bone from its transform F-Curves"""
+    rot_path, _ = get_rot_ani_path(owner)
+
+    locations = channel_values(fcurves, path_prefix + 'location', owner.location[:], frames)
+    rotations = channel_values(fcurves, path_prefix + rot_path, getattr(owner, rot_path)[:], frames)
+    scales = channel_values(fcurves, path_prefix + 'scale', owner.scale[:], frames)
+
+    return compose_matrices(locations, rotation_matrices(rotations, owner.rotation_mode), scales)
+
+
+def fk_pose_matrices(ob, fcurves, bone_names, frames):
+    """Return the (N, 4, 4) armature space matrices of the given pose bones at frames, from F-Curves alone.
+
+    Valid only for bones that, like their parents, have no constraints and inherit the full parent transform
+    """
+    pose_mats = dict()
+
+    def pose_matrices(pose_bone):
+        try:
+            return pose_mats[pose_bone.name]
+        except KeyError:
+            pass
+
+        basis = transform_basis_matrices(pose_bone, fcurves, frames, path_prefix=pose_bone_path(pose_bone.name, ""))
+        rest = matrix_array([pose_bone.bone.matrix_local])[0]
+        if pose_bone.parent:
+            parent_rest = matrix_array([pose_bone.parent.bone.matrix_local])[0]
+            rest = numpy.matmul(numpy.linalg.inv(parent_rest), rest)
+            mats = numpy.matmul(numpy.matmul(pose_matrices(pose_bone.parent), rest), basis)
+        else:
+            mats = numpy.matmul(rest, basis)
+
+        pose_mats[pose_bone.name] = mats
+        return mats
+
+    for bone_name in bone_names:
+        pose_matrices(ob.pose.bones[bone_name])
+
+    return pose_mats
@@ -0,0 +1,158 @@
+"""Bake constrained actions in background Blender processes
+
+The parent saves a copy of the current file, splits the actions among the workers and waits for them.
+Each worker opens the copy, bakes its share and writes the new actions to a temporary library,
+which is then appended by the parent in worker order.
+
+This file is also the worker script, run as:
+
+    blender -b copy.blend --python bake_pool.py -- job.json
+"""
+
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import addon_utils
+import bpy
+
+
+ADDON_NAME = os.path.basename(os.path.dirname(os.path.realpath(__file__)))
+
+
+def split_actions(action_names, workers):
+    """Split action names in contiguous, sorted chunks, one per worker"""
+    action_names = sorted(action_names)
+    chunk_size, remainder = divmod(len(action_names), workers)
+
+    chunks = []
+    start = 0
+    for i in range(workers):
+        end = start + chunk_size + (1 if i < remainder else 0)
+        if end > start:
+            chunks.append(action_names[start:end])
+        start = end
+
+    return chunks
+
+
+def bake_in_workers(object_names, action_names, workers, options):
+    """Bake action_names to the given objects using worker processes.
+    Return the new actions in merge order, the bake counters summed over the workers
+    and the names of the actions that a failed worker did not bake.
+
+    options are passed to armature.expykit_bake_constrained_actions in each worker
+    """
+    stats = dict()
+    failed = []
+    chunks = split_actions(action_names, workers)
+    if not chunks:
+        return [], stats, failed
+
+    tmp_dir = tempfile.mkdtemp(prefix="expykit_bake_")
+    processes = []
+    try:
+        blend_path = os.path.join(tmp_dir, "to_bake.blend")
+        bpy.ops.wm.save_as_mainfile(filepath=blend_path, copy=True)
+
+        for i, chunk in enumerate(chunks):
+            job_path = os.path.join(tmp_dir, "job_{:03d}.json".format(i))
+            job = {
+                "objects": object_names,
+                "actions": chunk,
+                "options": options,
+                "output": os.path.join(tmp_dir, "baked_{:03d}.blend".format(i)),
+                "stats": os.path.join(tmp_dir, "stats_{:03d}.json".format(i)),
+            }
+            with open(job_path, 'w') as job_file:
+                json.dump(job, job_file)
+
+            log_file = open(os.path.join(tmp_dir, "log_{:03d}.txt".format(i)), 'w')
+            try:
+                proc = subprocess.Popen([bpy.app.binary_path, "-b", blend_path,
+                                         "--python", os.path.realpath(__file__), "--", job_path],
+                                        stdout=log_file, stderr=subprocess.STDOUT)
+            except BaseException:
+                log_file.close()
+                raise
+            processes.append((proc, log_file, job))
+
+        new_actions = []
+        for i, (proc, log_file, job) in enumerate(processes):
+            proc.wait()
+            log_file.close()
+
+            if not os.path.isfile(job["output"]):
+                print("Bake worker {} failed, see log:".format(i))
+                with open(log_file.name) as log:
+                    print(log.read())
+                failed.extend(job["actions"])
+                continue
+
+            with bpy.data.libraries.load(job["output"], link=False) as (data_from, data_to):
+                data_to.actions = sorted(data_from.actions)
+
+            new_actions.extend(action for action in data_to.actions if action)
+
+            try:
+                with open(job["stats"]) as stats_file:
+                    worker_stats = json.load(stats_file)
+            except (OSError, ValueError) as e:
+                print("Bake worker {} counters are missing: {}".format(i, e))
+                stats["missing_stats"] = stats.get("missing_stats", 0) + 1
+                continue
+            for name, count in worker_stats.items():
+                stats[name] = stats.get(name, 0) + count
+
+        return new_actions, stats, failed
+    finally:
+        for proc, log_file, _ in processes:
+            if proc.poll() is None:
+                # interrupted: don't leave workers behind
+                proc.kill()
+                proc.wait()
+            log_file.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def ensure_addon():
+    try:
+        bpy.ops.armature.expykit_bake_constrained_actions.get_rna_type()
+    except KeyError:
+        addon_utils.enable(ADDON_NAME, default_set=False)
+
+
+def worker_main(job_path):
+    with open(job_path) as job_file:
+        job = json.load(job_file)
+
+    ensure_addon()
+
+    obs = [bpy.data.objects[ob_name] for ob_name in job["objects"]]
+    if bpy.context.object and bpy.context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    for ob in bpy.context.view_layer.objects:
+        ob.select_set(ob in obs)
+    bpy.context.view_layer.objects.active = obs[0]
+    bpy.ops.object.mode_set(mode='POSE')
+
+    old_actions = set(bpy.data.actions)
+    bpy.ops.armature.expykit_bake_constrained_actions(do_bake=True, workers=1,
+                                                      only_actions=json.dumps(job["actions"]),
+                                                      clear_users_old=False, fake_user_new=True,
+                                                      add_to_nla=False, **job["options"])
+
+    new_actions = set(action for action in bpy.data.actions if action not in old_actions)
+    bpy.data.libraries.write(job["output"], new_actions, fake_user=True)
+
+    operators = importlib.import_module(ADDON_NAME + ".operators")
+    with open(job["stats"], 'w') as stats_file:
+        json.dump(operators.last_bake_stats, stats_file)
+
+
+if __name__ == "__main__":
+    worker_main(sys.argv[sys.argv.index("--") + 1])
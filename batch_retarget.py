@@ -0,0 +1,276 @@
+"""Retarget a folder of .fbx clips to a character, without user interface
+
+Run with:
+
+    blender -b character.blend --python batch_retarget.py -- \
+        --src-preset Rigify_Controls.py --trg-preset Mixamo.py \
+        --fbx-dir /path/to/clips --out-dir /path/to/baked
+
+Each clip is imported, bound to the character armature, baked and saved (or exported)
+on its own, then removed together with its orphan data before the next clip is read.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+import addon_utils
+import bpy
+from mathutils import Matrix
+
+
+ADDON_NAME = os.path.basename(os.path.dirname(os.path.realpath(__file__)))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="batch_retarget",
+                                     description="Retarget .fbx clips to a character armature")
+    parser.add_argument("--blend", default="",
+                        help="File with the character to animate, if not given on the blender command line")
+    parser.add_argument("--armature", default="",
+                        help="Name of the character armature, the first armature found if empty")
+    parser.add_argument("--src-preset", required=True,
+                        help="Retarget preset of the character armature (i.e. Rigify_Controls.py), "
+                             "'auto' to detect it from the bone names")
+    parser.add_argument("--trg-preset", required=True,
+                        help="Retarget preset of the imported clips (i.e. Mixamo.py), "
+                             "'auto' to detect it for each clip")
+    parser.add_argument("--fbx-dir", required=True, help="Folder of .fbx clips")
+    parser.add_argument("--out-dir", required=True, help="Folder for the baked clips")
+    parser.add_argument("--format", choices=('blend', 'fbx'), default='blend',
+                        help="Save baked actions to .blend libraries or export them as .fbx")
+    parser.add_argument("--match-transform", choices=('None', 'Bone', 'Pose', 'World'), default='None',
+                        help="'Match Transform' option of 'Bind to Active Armature'")
+    parser.add_argument("--fit-height", default='--',
+                        help="'Fit height' option of 'Bind to Active Armature' (i.e. hips)")
+    parser.add_argument("--skip-existing", action='store_true',
+                        help="Skip clips that already have an output file")
+
+    return parser.parse_args(argv)
+
+
+def ensure_addon():
+    try:
+        bpy.ops.armature.expykit_constrain_to_armature.get_rna_type()
+    except KeyError:
+        addon_utils.enable(ADDON_NAME, default_set=False)
+
+
+def set_active(ob, selected=()):
+    """Make ob the only active and selected object, along with selected"""
+    if bpy.context.object and bpy.context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+    for other in bpy.context.selected_objects:
+        if bpy.app.version < (2, 80):
+            other.select = False
+        else:
+            other.select_set(False)
+
+    for other in list(selected) + [ob]:
+        if bpy.app.version < (2, 80):
+            other.select = True
+        else:
+            other.select_set(True)
+
+    if bpy.app.version < (2, 80):
+        bpy.context.scene.objects.active = ob
+    else:
+        bpy.context.view_layer.objects.active = ob
+
+
+def find_armature(name):
+    if name:
+        return bpy.data.objects[name]
+
+    return next(ob for ob in bpy.context.scene.objects if ob.type == 'ARMATURE')
+
+
+def detect_preset(armature):
+    """Return the installed preset that covers most bones of armature, None if no preset matches"""
+    preset_handler = importlib.import_module(ADDON_NAME + ".preset_handler")
+    ranking = preset_handler.detect_presets(armature.data.bones.keys())
+    if not ranking:
+        print("No preset matches the bones of {}".format(armature.name))
+        return None
+
+    preset, coverage, _ = ranking[0]
+    print("{}: using preset {} ({:.0%} of its bones found)".format(armature.name, preset, coverage))
+    return preset
+
+
+def remove_ids(ids):
+    ids = [id_data for id_data in ids if id_data]
+    if not ids:
+        return
+    try:
+        bpy.data.batch_remove(ids)
+    except AttributeError:
+        for id_data in ids:
+            if isinstance(id_data, bpy.types.Object):
+                bpy.data.objects.remove(id_data)
+            elif isinstance(id_data, bpy.types.Action):
+                bpy.data.actions.remove(id_data)
+
+
+def purge_orphans():
+    try:
+        bpy.data.orphans_purge(do_recursive=True)
+    except (AttributeError, TypeError):
+        # before blender 3.0: remove unused data manually
+        for collection in (bpy.data.actions, bpy.data.armatures, bpy.data.meshes,
+                           bpy.data.materials, bpy.data.images):
+            for id_data in list(collection):
+                if id_data.users == 0:
+                    collection.remove(id_data)
+
+
+def clip_out_paths(out_dir, clip_path, actions, fmt):
+    clip_name = os.path.splitext(os.path.basename(clip_path))[0]
+    if fmt == 'blend' or len(actions) < 2:
+        return [os.path.join(out_dir, "{}.{}".format(clip_name, fmt))]
+
+    return [os.path.join(out_dir, "{}_{}.fbx".format(clip_name, bpy.path.clean_name(action.name.split("|")[-1])))
+            for action in actions]
+
+
+# output files written for each clip, kept in the output folder
+MANIFEST_NAME = "batch_retarget_manifest.json"
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(out_dir, manifest):
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(manifest_path + ".tmp", 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def clip_done(manifest, out_dir, clip_path, fmt):
+    """Return True if the outputs of clip_path were all written by a previous run"""
+    out_names = manifest.get(os.path.basename(clip_path))
+    if out_names:
+        return all(os.path.isfile(os.path.join(out_dir, out_name)) for out_name in out_names)
+
+    # single output, from a run without manifest
+    return os.path.isfile(clip_out_paths(out_dir, clip_path, [], fmt)[0])
+
+
+def save_clip(character, actions, out_paths, fmt):
+    if fmt == 'blend':
+        bpy.data.libraries.write(out_paths[0], set(actions), fake_user=True)
+        return
+
+    set_active(character)
+    for action, out_path in zip(actions, out_paths):
+        character.animation_data.action = action
+        bpy.ops.export_scene.fbx(filepath=out_path, use_selection=True, object_types={'ARMATURE'},
+                                 bake_anim_use_all_actions=False, bake_anim_use_nla_strips=False)
+
+
+def retarget_clip(character, clip_path, args):
+    """Import, bind and bake a single clip, return the baked actions"""
+    old_objects = set(bpy.data.objects)
+    old_actions = set(bpy.data.actions)
+
+    set_active(character)
+    bpy.ops.import_scene.fbx(filepath=clip_path)
+
+    clip_actions = set(bpy.data.actions) - old_actions
+    try:
+        clip_armature = next(ob for ob in bpy.data.objects if ob not in old_objects and ob.type == 'ARMATURE')
+    except StopIteration:
+        print("No armature found in {}".format(clip_path))
+        return []
+
+    trg_preset = detect_preset(clip_armature) if args.trg_preset == 'auto' else args.trg_preset
+    if not trg_preset:
+        return []
+
+    set_active(clip_armature, selected=[character])
+    bpy.ops.object.mode_set(mode='POSE')
+    bpy.ops.armature.expykit_constrain_to_armature(src_preset=args.src_preset, trg_preset=trg_preset,
+                                                   match_transform=args.match_transform,
+                                                   fit_target_scale=args.fit_height)
+
+    set_active(character)
+    bpy.ops.object.mode_set(mode='POSE')
+    bpy.ops.armature.expykit_bake_constrained_actions(do_bake=True, clear_users_old=False,
+                                                      fake_user_new=False, add_to_nla=False)
+    bpy.ops.object.mode_set(mode='OBJECT')
+
+    return [action for action in bpy.data.actions if action not in old_actions and action not in clip_actions]
+
+
+def run(args):
+    ensure_addon()
+    if args.blend:
+        bpy.ops.wm.open_mainfile(filepath=args.blend)
+
+    character = find_armature(args.armature)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    clips = sorted(f for f in os.listdir(args.fbx_dir) if f.lower().endswith(".fbx"))
+    manifest = load_manifest(args.out_dir)
+    if args.src_preset == 'auto':
+        args.src_preset = detect_preset(character)
+        if not args.src_preset:
+            return clips
+
+    failed = []
+    for i, clip in enumerate(clips):
+        clip_path = os.path.join(args.fbx_dir, clip)
+        if args.skip_existing and clip_done(manifest, args.out_dir, clip_path, args.format):
+            continue
+
+        start_time = time.time()
+        old_objects = set(bpy.data.objects)
+        old_actions = set(bpy.data.actions)
+        try:
+            baked = retarget_clip(character, clip_path, args)
+            if baked:
+                out_paths = clip_out_paths(args.out_dir, clip_path, baked, args.format)
+                save_clip(character, baked, out_paths, args.format)
+                manifest[clip] = [os.path.basename(out_path) for out_path in out_paths]
+                save_manifest(args.out_dir, manifest)
+            else:
+                failed.append(clip)
+        except Exception as e:
+            print("Failed to retarget {}: {}".format(clip, e))
+            failed.append(clip)
+        finally:
+            # keep only one clip in memory
+            if bpy.context.object and bpy.context.object.mode != 'OBJECT':
+                bpy.ops.object.mode_set(mode='OBJECT')
+            remove_ids([ob for ob in bpy.data.objects if ob not in old_objects]
+                       + [action for action in bpy.data.actions if action not in old_actions])
+            purge_orphans()
+            for pb in character.pose.bones:
+                pb.matrix_basis = Matrix()
+
+        print("{}/{} {} ({:.2f}s)".format(i + 1, len(clips), clip, time.time() - start_time))
+
+    if failed:
+        print("{} clips could not be retargeted:\n{}".format(len(failed), "\n".join(failed)))
+
+    return failed
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    failed = run(parse_args(argv))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
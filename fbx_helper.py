@@ -1,30 +1,482 @@
-from io_scene_fbx import parse_fbx
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from contextlib import contextmanager
+
+import numpy
 from io_scene_fbx.fbx_utils import FBX_KTIME
-from io_scene_fbx.import_fbx import elem_find_first
+
+
+# binary FBX files start with the magic string, two padding bytes and the version number
+FBX_BINARY_MAGIC = b"Kaydara FBX Binary  \x00"
+FBX_HEADER_SIZE = 27
+
+# size of the scalar properties, by type code
+_PROP_FORMATS = {
+    b'Y': '<h',
+    b'C': '<?',
+    b'I': '<i',
+    b'F': '<f',
+    b'D': '<d',
+    b'L': '<q',
+}
+
+# item type of the array properties, by type code
+_ARRAY_TYPES = {
+    b'f': '<f4',
+    b'd': '<f8',
+    b'l': '<i8',
+    b'i': '<i4',
+    b'b': '<i1',
+}
+
+# errors of reading a malformed file, that is then skipped
+FBX_READ_ERRORS = (OSError, struct.error, ValueError, IndexError, KeyError, zlib.error)
+
+
+@contextmanager
+def _mapped_fbx(filepath):
+    """Map a binary .fbx file in memory, yield (memoryview of the file, version), (None, None) if not a binary FBX.
+
+    Slices of the memoryview must not outlive the context: values are copied out as they are read
+    """
+    with open(filepath, 'rb') as fbx_file:
+        if os.fstat(fbx_file.fileno()).st_size < FBX_HEADER_SIZE:
+            yield None, None
+            return
+
+        with mmap.mmap(fbx_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            data = memoryview(mapped)
+            try:
+                if data[:len(FBX_BINARY_MAGIC)] != FBX_BINARY_MAGIC:
+                    yield None, None
+                else:
+                    yield data, struct.unpack_from('<I', data, FBX_HEADER_SIZE - 4)[0]
+            finally:
+                data.release()
+
+
+def _iter_nodes(data, version, offset, end):
+    """Yield (name, end offset, property count, properties offset, property list size) of the nodes
+    from offset up to end, stopping at the null record closing the node list"""
+    header_format = '<QQQB' if version >= 7500 else '<IIIB'
+    header_size = struct.calcsize(header_format)
+
+    while offset < end:
+        end_offset, num_props, props_size, name_len = struct.unpack_from(header_format, data, offset)
+        if end_offset == 0:
+            return
+        if end_offset <= offset or end_offset > end:
+            # corrupt or truncated file, would not move forward
+            raise ValueError("Bad FBX node end offset {} at {}".format(end_offset, offset))
+
+        name_offset = offset + header_size
+        props_offset = name_offset + name_len
+        yield bytes(data[name_offset:props_offset]), end_offset, num_props, props_offset, props_size
+        offset = end_offset
+
+
+def _read_props(data, offset, num_props, read_arrays=False):
+    """Read num_props properties at offset. Arrays are returned as numpy arrays
+    if read_arrays is True, otherwise they are skipped without being inflated"""
+    props = []
+    for _ in range(num_props):
+        prop_type = bytes(data[offset:offset + 1])
+        offset += 1
+        try:
+            prop_format = _PROP_FORMATS[prop_type]
+        except KeyError:
+            pass
+        else:
+            props.append(struct.unpack_from(prop_format, data, offset)[0])
+            offset += struct.calcsize(prop_format)
+            continue
+
+        if prop_type in (b'S', b'R'):
+            size = struct.unpack_from('<I', data, offset)[0]
+            offset += 4
+            props.append(bytes(data[offset:offset + size]))
+            offset += size
+            continue
+
+        # array: length, encoding, stored size, then data
+        _, encoding, stored_size = struct.unpack_from('<III', data, offset)
+        offset += 12
+        if not read_arrays:
+            props.append(None)
+        elif encoding == 1:
+            props.append(numpy.frombuffer(zlib.decompress(data[offset:offset + stored_size]),
+                                          dtype=_ARRAY_TYPES[prop_type]))
+        else:
+            # copy, not to keep a view of the mapped file
+            props.append(numpy.frombuffer(data[offset:offset + stored_size], dtype=_ARRAY_TYPES[prop_type]).copy())
+        offset += stored_size
+
+    return props
+
+
+def _read_properties70(data, version, children_offset, node_end):
+    """Return the values of the Properties70 child of a node, by property name"""
+    values = dict()
+
+    for name, end_offset, _, props_offset, props_size in _iter_nodes(data, version, children_offset, node_end):
+        if name != b'Properties70':
+            continue
+
+        for _, _, num_props, p_offset, _ in _iter_nodes(data, version, props_offset + props_size, end_offset):
+            props = _read_props(data, p_offset, num_props)
+            # name, type, label, flags, values...
+            if len(props) > 4:
+                values[props[0]] = props[4:]
+        break
+
+    return values
+
+
+# frame rate of the GlobalSettings TimeMode values, 14 is TimeModeCustom
+FBX_TIME_MODES = {
+    1: 120.0,
+    2: 100.0,
+    3: 60.0,
+    4: 50.0,
+    5: 48.0,
+    6: 30.0,
+    7: 30.0,
+    8: 30000 / 1001,
+    9: 30000 / 1001,
+    10: 25.0,
+    11: 24.0,
+    12: 1000.0,
+    13: 24000 / 1001,
+    15: 96.0,
+    16: 72.0,
+    17: 60000 / 1001,
+    18: 120000 / 1001,
+}
+FBX_TIME_MODE_CUSTOM = 14
+
+
+def _read_global_fps(data, version, children_offset, node_end):
+    """Return the frame rate from the Properties70 of GlobalSettings, None if not set"""
+    values = _read_properties70(data, version, children_offset, node_end)
+    time_mode = values.get(b'TimeMode', [None])[0]
+
+    if time_mode == FBX_TIME_MODE_CUSTOM:
+        return values.get(b'CustomFrameRate', [None])[0]
+
+    return FBX_TIME_MODES.get(time_mode)
+
+
+def _read_takes(data, version, children_offset, node_end):
+    """Return [name, start, end] of the takes, from their ReferenceTime"""
+    takes = []
+
+    for take_name, take_end, num_props, take_offset, take_size in _iter_nodes(data, version,
+                                                                              children_offset, node_end):
+        if take_name != b'Take':
+            continue
+
+        name = _read_props(data, take_offset, num_props)
+        name = name[0].decode('utf-8', 'replace') if name else ""
+
+        for elem_name, _, elem_props, elem_offset, _ in _iter_nodes(data, version, take_offset + take_size, take_end):
+            if elem_name == b'ReferenceTime':
+                start, end = _read_props(data, elem_offset, elem_props)[:2]
+                takes.append([name, start, end])
+                break
+
+    return takes
+
+
+def read_fbx_metadata(filepath):
+    """Return {"takes": [[name, start, end], ...], "fps": frame rate or None} of a binary .fbx file,
+    None if it can't be read.
+
+    The file is mapped in memory, only GlobalSettings and Takes are parsed:
+    other nodes are skipped by their end offset
+    """
+    try:
+        with _mapped_fbx(filepath) as (data, version):
+            if data is None:
+                # can't read
+                return
+
+            metadata = {"takes": [], "fps": None}
+            for name, end_offset, _, props_offset, props_size in _iter_nodes(data, version,
+                                                                             FBX_HEADER_SIZE, len(data)):
+                if name == b'GlobalSettings':
+                    metadata["fps"] = _read_global_fps(data, version, props_offset + props_size, end_offset)
+                elif name == b'Takes':
+                    metadata["takes"] = _read_takes(data, version, props_offset + props_size, end_offset)
+                    # Takes come after GlobalSettings
+                    break
+
+            return metadata
+    except FBX_READ_ERRORS:
+        # can't read
+        return
+
+
+def _first_take_time(metadata):
+    if not metadata or not metadata["takes"]:
+        return
+
+    return metadata["takes"][0][1:]
 
 
 def get_fbx_local_time(filepath):
+    """Return the ReferenceTime [start, end] of the first take in a binary .fbx file"""
+    return _first_take_time(read_fbx_metadata(filepath))
+
+
+# euler order of the Model RotationOrder values
+FBX_ROTATION_ORDERS = ('XYZ', 'XZY', 'YZX', 'YXZ', 'ZXY', 'ZYX')
+FBX_SAMPLED_CHANNELS = {
+    b'Lcl Translation': "location",
+    b'Lcl Rotation': "rotation",
+}
+
+
+def _read_curve_keys(data, version, children_offset, node_end):
+    """Return the KeyTime and KeyValueFloat arrays of an AnimationCurve"""
+    key_times = None
+    key_values = None
+
+    for name, _, num_props, props_offset, _ in _iter_nodes(data, version, children_offset, node_end):
+        if name == b'KeyTime':
+            key_times = _read_props(data, props_offset, num_props, read_arrays=True)[0]
+        elif name == b'KeyValueFloat':
+            key_values = _read_props(data, props_offset, num_props, read_arrays=True)[0]
+
+    return key_times, key_values
+
+
+def read_fbx_bone_samples(filepath, bone_name, sample_count):
+    """Sample the translation and rotation curves of a bone in a binary .fbx file.
+
+    Keys are linearly interpolated at sample_count times evenly spread over the animated range.
+    Return {"location": (K, 3) array, "rotation": (K, 3) euler radians, "rotation_order": euler order},
+    None if the file can't be read or the bone is not animated
+    """
+    model_name = bone_name.encode('utf-8') + b"\x00\x01Model"
+    model_id = None
+    rotation_order = 0
+    curve_nodes = dict()
+    curves = dict()
+    node_curves = dict()
+    node_channels = dict()
+
     try:
-        elem_root, version = parse_fbx.parse(filepath)
-    except Exception as e:
+        with _mapped_fbx(filepath) as (data, version):
+            if data is None:
+                # can't read
+                return
+
+            for name, end_offset, _, props_offset, props_size in _iter_nodes(data, version,
+                                                                             FBX_HEADER_SIZE, len(data)):
+                if name == b'Objects':
+                    # only note where the curves are, their keys are read once the bone is found
+                    for obj_type, obj_end, num_props, obj_offset, obj_size in _iter_nodes(data, version,
+                                                                                          props_offset + props_size,
+                                                                                          end_offset):
+                        if obj_type not in (b'Model', b'AnimationCurveNode', b'AnimationCurve'):
+                            continue
+
+                        props = _read_props(data, obj_offset, num_props)
+                        children_offset = obj_offset + obj_size
+                        if obj_type == b'AnimationCurve':
+                            curves[props[0]] = (children_offset, obj_end)
+                        elif obj_type == b'AnimationCurveNode':
+                            curve_nodes[props[0]] = (children_offset, obj_end)
+                        elif props[1] == model_name:
+                            model_id = props[0]
+                            values = _read_properties70(data, version, children_offset, obj_end)
+                            rotation_order = values.get(b'RotationOrder', [0])[0]
+                elif name == b'Connections':
+                    if model_id is None:
+                        return
+
+                    for _, _, num_props, c_offset, _ in _iter_nodes(data, version, props_offset + props_size,
+                                                                    end_offset):
+                        props = _read_props(data, c_offset, num_props)
+                        if props[0] != b'OP':
+                            continue
+
+                        # child, parent, property of the parent
+                        child_id, parent_id, prop_name = props[1:4]
+                        if parent_id == model_id and prop_name in FBX_SAMPLED_CHANNELS and child_id in curve_nodes:
+                            node_channels[child_id] = FBX_SAMPLED_CHANNELS[prop_name]
+                        elif child_id in curves and parent_id in curve_nodes:
+                            node_curves.setdefault(parent_id, dict())[prop_name] = child_id
+                    break
+
+            channels = dict()
+            for node_id, channel in node_channels.items():
+                defaults = _read_properties70(data, version, *curve_nodes[node_id])
+                axes = []
+                for axis in (b'd|X', b'd|Y', b'd|Z'):
+                    try:
+                        curve_id = node_curves[node_id][axis]
+                    except KeyError:
+                        axes.append(defaults.get(axis, [0.0])[0])
+                        continue
+                    axes.append(_read_curve_keys(data, version, *curves[curve_id]))
+                channels[channel] = axes
+    except FBX_READ_ERRORS:
         # can't read
         return
 
-    takes = elem_find_first(elem_root, b'Takes')
-    local_time = None
-    for take in takes:
-        for elem in take:
+    key_times = [axis[0] for axes in channels.values() for axis in axes
+                 if isinstance(axis, tuple) and axis[0] is not None and len(axis[0])]
+    if not key_times:
+        return
+
+    start = min(times[0] for times in key_times)
+    end = max(times[-1] for times in key_times)
+    sample_times = numpy.linspace(start, end, sample_count)
+
+    samples = {"rotation_order": FBX_ROTATION_ORDERS[rotation_order] if rotation_order < 6 else 'XYZ'}
+    for channel in FBX_SAMPLED_CHANNELS.values():
+        values = numpy.zeros((sample_count, 3))
+        for i, axis in enumerate(channels.get(channel, ())):
+            if not isinstance(axis, tuple):
+                values[:, i] = axis
+            elif axis[0] is not None and axis[1] is not None and len(axis[0]):
+                values[:, i] = numpy.interp(sample_times, axis[0].astype(numpy.float64), axis[1])
+        samples[channel] = values
+
+    samples["rotation"] = numpy.radians(samples["rotation"])
+    return samples
+
+
+class FbxMetadataCache:
+    """Metadata and bone samples of .fbx files stored in a json file, keyed by absolute path and checked against size and mtime.
+
+    Safe to use from several threads, call save() once done
+    """
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._changed = False
+
+        try:
+            with open(cache_path) as cache_file:
+                self._entries = json.load(cache_file)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def _entry(self, filepath):
+        """Return the cache entry of filepath, emptied if the file changed since it was cached"""
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return
+
+        with self._lock:
+            entry = self._entries.get(filepath)
+            if not entry or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+                entry = self._entries[filepath] = {"size": stat.st_size, "mtime": stat.st_mtime}
+                self._changed = True
+
+        return entry
+
+    def metadata(self, filepath):
+        """Return the metadata of filepath, read from the file only if it changed since it was cached"""
+        filepath = os.path.abspath(filepath)
+        entry = self._entry(filepath)
+        if entry is None:
+            return
+        if "metadata" in entry:
+            return entry["metadata"]
+
+        metadata = read_fbx_metadata(filepath)
+        with self._lock:
+            entry["metadata"] = metadata
+            self._changed = True
+
+        return metadata
+
+    def bone_samples(self, filepath, bone_name, sample_count):
+        """Return the samples of bone_name in filepath, read from the file only if it changed since it was cached"""
+        filepath = os.path.abspath(filepath)
+        entry = self._entry(filepath)
+        if entry is None:
+            return
+
+        key = "{}:{}".format(bone_name, sample_count)
+        with self._lock:
+            cached = entry.setdefault("samples", {})
+        if key in cached:
+            samples = cached[key]
+            if samples:
+                samples = {channel: values if channel == "rotation_order" else numpy.array(values)
+                           for channel, values in samples.items()}
+            return samples
+
+        samples = read_fbx_bone_samples(filepath, bone_name, sample_count)
+        with self._lock:
+            if samples:
+                cached[key] = {channel: values if channel == "rotation_order" else values.tolist()
+                               for channel, values in samples.items()}
+            else:
+                cached[key] = None
+            self._changed = True
+
+        return samples
+
+    def local_time(self, filepath):
+        """Return the ReferenceTime [start, end] of the first take of filepath"""
+        return _first_take_time(self.metadata(filepath))
+
+    def save(self):
+        """Write the cache file if any entry was added"""
+        with self._lock:
+            if not self._changed:
+                return
+
+            tmp_path = self.cache_path + ".tmp"
             try:
-                local_time = elem_find_first(elem, b'ReferenceTime')
-            except (KeyError, AttributeError):
-                continue
-            if local_time:
-                break
+                with open(tmp_path, 'w') as cache_file:
+                    json.dump(self._entries, cache_file)
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                print("Could not save fbx cache {}: {}".format(self.cache_path, e))
+                return
+
+            self._changed = False
+
+
+def _scan(read, filepaths, max_workers, *args):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(read, filepath, *args): filepath for filepath in filepaths}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
 
-    if local_time:
-        return local_time.props
+
+def scan_local_times(filepaths, max_workers=8, cache=None):
+    """Read the ReferenceTime of the given .fbx files in a pool of threads,
+    yield (filepath, ReferenceTime or None) in order of completion.
+
+    If an FbxMetadataCache is given, unchanged files are not read again
+    """
+    return _scan(cache.local_time if cache else get_fbx_local_time, filepaths, max_workers)
+
+
+def scan_bone_samples(filepaths, bone_name, sample_count, max_workers=8, cache=None):
+    """Sample a bone of the given .fbx files in a pool of threads,
+    yield (filepath, samples or None) in order of completion.
+
+    If an FbxMetadataCache is given, unchanged files are not read again
+    """
+    return _scan(cache.bone_samples if cache else read_fbx_bone_samples, filepaths, max_workers,
+                 bone_name, sample_count)
 
 
 def convert_from_fbx_duration(start, end):
     return (end - start)/FBX_KTIME
-
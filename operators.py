@@ -1,7 +1,13 @@
 from math import pi
+import bisect
+import hashlib
+import json
 import os
+import re
+import time
 
 import bpy
+import numpy
 from bpy.props import BoolProperty
 from bpy.props import EnumProperty
 from bpy.props import FloatProperty
@@ -10,14 +16,19 @@ from bpy.props import StringProperty
 from bpy.props import CollectionProperty
 from bpy.props import FloatVectorProperty
 
+from bpy.app.handlers import persistent
 from bpy_extras.io_utils import ImportHelper
 
+from collections import namedtuple
+from collections import OrderedDict
 from itertools import chain
 
 from .rig_mapping import bone_mapping
 from . import preset_handler
 from . import bone_utils
 from . import fbx_helper
+from . import anim_utils
+from . import bake_pool
 from .version_compatibility import make_annotations, matmul, get_preferences, layout_split
 
 from mathutils import Vector
@@ -399,6 +410,8 @@ class ConvertBoneNaming(bpy.types.Operator):
                     fc.data_path = fc.data_path.replace('bones["{0}"'.format(track_bone),
                                                         'bones["{0}"'.format(trg_name))
 
+                forget_action_index(action)
+
             if set_preset:
                 preset_handler.set_preset_skel(self.trg_preset)
             else:
@@ -2255,7 +2268,155 @@ def get_all_fcurves(action):
                     for fc in c.fcurves:
                         yield fc
 
+def reduce_action_keys(action, tolerance, fcurves=None):
+    """Reduce the keyframes of the given F-Curves, all those in action by default.
+    Return the key count before and after and max error per bone"""
+    keys_before = 0
+    keys_after = 0
+    bone_errors = dict()
+
+    for fc in get_all_fcurves(action) if fcurves is None else fcurves:
+        before, after, max_error = anim_utils.reduce_fcurve(fc, tolerance)
+        keys_before += before
+        keys_after += after
+
+        bone_name = crv_bone_name(fc) or fc.data_path
+        bone_errors[bone_name] = max(max_error, bone_errors.get(bone_name, 0.0))
+
+    return keys_before, keys_after, bone_errors
+
+
+def print_reduction(action, bone_errors):
+    print("Reduced keys of {}, max error per bone:".format(action.name))
+    for bone_name, max_error in sorted(bone_errors.items()):
+        print("    {}: {:.6f}".format(bone_name, max_error))
+
+
+def reduction_report(keys_before, keys_after):
+    ratio = keys_before / keys_after if keys_after else 1.0
+    return "keyframes reduced from {} to {} ({:.1f}:1)".format(keys_before, keys_after, ratio)
+
+
+BONE_PATH_RE = re.compile(r'^pose\.bones\["((?:[^"\\]|\\.)*)"\]\.(\w+)$')
+TRANSFORM_SIZES = {'location': 3, 'rotation_quaternion': 4, 'rotation_euler': 3,
+                   'rotation_axis_angle': 4, 'scale': 3}
+
+_action_index = dict()
+
+
+def _channelbag_fcurves(action):
+    """Return the F-Curves of action, one list per channelbag (a single one for legacy actions)"""
+    try:
+        layers = action.layers
+    except AttributeError:
+        return [action.fcurves]
+
+    return [c.fcurves for l in layers for s in l.strips for c in s.channelbags]
+
+
+def _index_paths(paths):
+    """Split (data path, array index) pairs in the set of animated pose bone transforms
+    and the list of other paths, that must be resolved one by one"""
+    bone_names = set()
+    other_paths = []
+    for data_path, index in paths:
+        match = BONE_PATH_RE.match(data_path)
+        if match and index < TRANSFORM_SIZES.get(match.group(2), 0):
+            bone_names.add(match.group(1).replace('\\"', '"').replace('\\\\', '\\'))
+        elif index:
+            other_paths.append(data_path + "[%d]" % index)
+        else:
+            other_paths.append(data_path)
+
+    return frozenset(bone_names), tuple(other_paths)
+
+
+def _action_key(action):
+    try:
+        return action.session_uid
+    except AttributeError:
+        # older blender: pointers can be reused by new actions, entries also check data paths
+        return action.as_pointer()
+
+
+def action_index(action):
+    """Return (bone names, other paths) animated by each channelbag of action, None for empty channelbags.
+
+    Entries are checked against the F-Curve count and a fingerprint of the data paths of each channelbag,
+    they are also dropped when the depsgraph reports an update of the action or by forget_action_index
+    """
+    channelbags = _channelbag_fcurves(action)
+    paths = [[(fc.data_path, fc.array_index) for fc in fcurves] for fcurves in channelbags]
+    fingerprint = (tuple(len(bag_paths) for bag_paths in paths),
+                   hash(tuple(path for bag_paths in paths for path in bag_paths)))
+
+    key = _action_key(action)
+    try:
+        cached_fingerprint, entry = _action_index[key]
+    except KeyError:
+        pass
+    else:
+        if cached_fingerprint == fingerprint:
+            return entry
+
+    if len(_action_index) > 2 * len(bpy.data.actions) + 64:
+        # drop removed actions
+        _action_index.clear()
+
+    entry = [_index_paths(bag_paths) if bag_paths else None for bag_paths in paths]
+    _action_index[key] = (fingerprint, entry)
+
+    return entry
+
+
+def forget_action_index(action):
+    """Drop the index of action, to be called after editing its data paths"""
+    _action_index.pop(_action_key(action), None)
+
+
+@persistent
+def _drop_updated_actions(scene, depsgraph=None):
+    """Forget the index of the actions updated in depsgraph"""
+    if not _action_index:
+        return
+    if depsgraph is None:
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Action):
+            forget_action_index(update.id.original)
+
+
+def _armature_bones(path_resolve):
+    """Return the pose bone names of the armature owning path_resolve, None if not an armature"""
+    ob = getattr(path_resolve, '__self__', None)
+    pose = getattr(ob, 'pose', None)
+    if not pose:
+        return None
+
+    return frozenset(pose.bones.keys())
+
+
+def _paths_valid(bag_entry, bone_names, path_resolve):
+    animated_bones, other_paths = bag_entry
+    if not animated_bones <= bone_names:
+        return False
+
+    for data_path in other_paths:
+        try:
+            path_resolve(data_path)
+        except ValueError:
+            return False
+
+    return True
+
+
 def validate_action(action, path_resolve): # :Action, :callable
+    bone_names = _armature_bones(path_resolve)
+    if bone_names is not None:
+        return all(_paths_valid(bag_entry, bone_names, path_resolve)
+                   for bag_entry in action_index(action) if bag_entry)
+
     for fc in get_all_fcurves(action):
         data_path = fc.data_path
         if fc.array_index:
@@ -2304,6 +2465,14 @@ def action_base_name(name):
 
 
 def find_validate_action_slot(act, path_resolve):  # thanks again, io_fbx dev!
+    bone_names = _armature_bones(path_resolve)
+    if bone_names is not None:
+        channelbags = [c for l in act.layers for s in l.strips for c in s.channelbags]
+        for channelbag, bag_entry in zip(channelbags, action_index(act)):
+            if bag_entry and _paths_valid(bag_entry, bone_names, path_resolve):
+                return channelbag.slot
+        return None
+
     for layer in act.layers:
         for strip in layer.strips:
             for channelbag in strip.channelbags:
@@ -2324,12 +2493,14 @@ def find_validate_action_slot(act, path_resolve):  # thanks again, io_fbx dev!
     return None  # Found nothing to return.
 
 
+# counters of the last bake, read by bake_pool workers
+last_bake_stats = dict()
+
+
 @make_annotations
-class BakeConstrainedActions(bpy.types.Operator):
-    bl_idname = "armature.expykit_bake_constrained_actions"
-    bl_label = "Bake Constrained Actions"
-    bl_description = "Bake Actions constrained from another Armature. No need to select two armatures"
-    bl_options = {'REGISTER', 'UNDO'}
+class BakeConstrainedBase():
+    """Settings and steps shared by the bake operators"""
+    _interactive = False
 
     clear_users_old = BoolProperty(name="Clear original Action Users",
                                   default=True)
@@ -2341,6 +2512,30 @@ class BakeConstrainedActions(bpy.types.Operator):
 
     add_to_nla = BoolProperty(name="Stash to NLA stack", default=False, description="Stash new actions as NLA strips.")
 
+    use_nla_bake = BoolProperty(name="Use Blender Bake", default=False,
+                                description="Bake using bpy.ops.nla.bake (slower)")
+
+    group_by_target = BoolProperty(name="One Pass per Target", default=True,
+                                   description="Bake armatures bound to the same target in a single timeline pass")
+
+    reduce_keys = BoolProperty(name="Reduce Keyframes", default=False,
+                               description="Remove keyframes that linear interpolation can replace")
+
+    reduce_tolerance = FloatProperty(name="Tolerance", default=0.001, min=0.0, precision=4,
+                                     description="Max error of the reduced animation curves")
+
+    only_moving = BoolProperty(name="Only Moving Channels", default=False,
+                               description="Key channels that the binding leaves constant only once")
+
+    skip_unchanged = BoolProperty(name="Skip Unchanged", default=False,
+                                  description="Don't bake again actions whose source, binding and settings did not change")
+
+    workers = IntProperty(name="Worker Processes", default=1, min=1, max=64,
+                          description="Split the actions among background Blender processes")
+
+    only_actions = StringProperty(default="", options={'HIDDEN', 'SKIP_SAVE'},
+                                  description="JSON list of the action names to bake, all actions if empty")
+
     do_bake = BoolProperty(name="Bake and Exit", description="Bake driven motion and exit",
                           default=False, options={'SKIP_SAVE'})
 
@@ -2374,6 +2569,44 @@ class BakeConstrainedActions(bpy.types.Operator):
         row.label(text="")
         row.prop(self, "add_to_nla")
 
+        if not self._interactive:
+            row = layout_split(column, factor=0.30, align=True)
+            row.label(text="")
+            row.prop(self, "use_nla_bake")
+
+        row = layout_split(column, factor=0.30, align=True)
+        row.label(text="")
+        row.prop(self, "group_by_target")
+        row.enabled = not self.use_nla_bake or self._interactive
+
+        row = layout_split(column, factor=0.30, align=True)
+        row.label(text="")
+        row.prop(self, "only_moving")
+        row.enabled = not self.use_nla_bake or self._interactive
+
+        row = layout_split(column, factor=0.30, align=True)
+        row.label(text="")
+        row.prop(self, "skip_unchanged")
+
+        row = layout_split(column, factor=0.30, align=True)
+        row.label(text="")
+        row.prop(self, "reduce_keys")
+        subrow = row.row()
+        subrow.prop(self, "reduce_tolerance")
+        subrow.enabled = self.reduce_keys
+
+        if self._interactive:
+            row = layout_split(column, factor=0.30, align=True)
+            row.label(text="")
+            row.prop(self, "frames_per_tick")
+            return
+
+        if bpy.app.version >= (2, 80):
+            row = layout_split(column, factor=0.30, align=True)
+            row.label(text="")
+            row.prop(self, "workers")
+            row.enabled = not self.use_nla_bake
+
         row = layout_split(column, factor=0.30, align=True)
         row.label(text="")
         row.prop(self, "do_bake", toggle=True)
@@ -2393,90 +2626,288 @@ class BakeConstrainedActions(bpy.types.Operator):
                 if subtarget.endswith("_RET"):
                     return(constr.target)
 
-    def execute(self, context):
-        if not self.do_bake:
-            return {'FINISHED'}
-
+    @staticmethod
+    def _nla_bake(fr_start, fr_end):
+        """Bake selected bones with bpy.ops.nla.bake, return the new action"""
         old_actions = set(bpy.data.actions)
-        old_cnt = len(old_actions)
+        bpy.ops.nla.bake(frame_start=int(fr_start), frame_end=int(fr_end),
+                         bake_types={'POSE'}, only_selected=True,
+                         visual_keying=True, clear_constraints=False)
 
-        sel_obs = list(context.selected_objects)
-        for ob in sel_obs:
-            if bpy.app.version < (2, 80):
-                ob.select = False
-            else:
-                ob.select_set(False)
+        try:
+            return next(a for a in bpy.data.actions if a not in old_actions)  # I might have created a new action and used it in bpy.ops.nla.bake! :|
+        except StopIteration:
+            return None
 
-            trg_ob = self.get_trg_ob(ob)
-            if not trg_ob:
-                continue
+    @staticmethod
+    def _select_bound_controls(ob, trg_ob, exclude_deform=True):
+        """Select the controls of ob bound to trg_ob, return their names"""
+        def select_pose_bone(pb, selected):
+            try:
+                pb.select = selected
+            except AttributeError:
+                pb.bone.select = selected
 
-            constr_bone_names = []
+        constr_bone_names = []
+        for pb in bone_utils.get_constrained_controls(ob, unselect=True, use_deform=not exclude_deform):
 
-            def select_pose_bone(pb, selected):
-                try:
-                    pb.select = selected
-                except AttributeError:
-                    pb.bone.select = selected
+            if pb.name + "_RET" in trg_ob.data.bones:
+                select_pose_bone(pb, True)
+                constr_bone_names.append(pb.name)
 
-            for pb in bone_utils.get_constrained_controls(ob, unselect=True, use_deform=not self.exclude_deform):
+        return constr_bone_names
 
-                if pb.name + "_RET" in trg_ob.data.bones:
-                    select_pose_bone(pb, True)
-                    constr_bone_names.append(pb.name)
+    def _bound_digest(self, ob, trg_ob, bone_names):
+        """Hash the bound bones and their _RET counterparts: rest matrices, parents and constraints with their
+        targets, along with the bake settings"""
+        hasher = hashlib.sha1()
+        hasher.update(repr((self.exclude_deform, self.use_nla_bake, self.only_moving,
+                            self.reduce_keys, self.reduce_tolerance)).encode())
 
-            for action in list(bpy.data.actions):  # convert to list beforehand to avoid picking new actions
-                if not validate_action(action, trg_ob.path_resolve):
-                    continue
+        for bone_name in bone_names:
+            anim_utils.update_hash_bone(hasher, ob, bone_name)
 
-                trg_ob.animation_data.action = action
+            ret_name = bone_name + "_RET"
+            if ret_name in trg_ob.data.bones:
+                anim_utils.update_hash_bone(hasher, trg_ob, ret_name)
 
-                try:
-                    act_slot = ob.animation_data.action_slot
-                except AttributeError:
-                    pass
-                else:
-                    act_slot = find_validate_action_slot(action, trg_ob.path_resolve)
-                    if not act_slot:
-                        continue
-                    trg_ob.animation_data.action_slot = act_slot
+        return hasher.digest()
 
-                fr_start, fr_end = action.frame_range
-                bpy.ops.nla.bake(frame_start=int(fr_start), frame_end=int(fr_end),
-                                 bake_types={'POSE'}, only_selected=True,
-                                 visual_keying=True, clear_constraints=False)
+    @staticmethod
+    def _action_digest(action):
+        hasher = hashlib.sha1()
+        hasher.update(repr(action.frame_range[:]).encode())
+        anim_utils.update_hash_fcurves(hasher, get_all_fcurves(action))
 
-                trg_ob.animation_data.action = None
+        return hasher.digest()
 
-                try:
-                    new_action = next(a for a in bpy.data.actions if a not in old_actions)  # I might have created a new action and used it in bpy.ops.nla.bake! :|
-                except StopIteration:
-                    self.report({'WARNING'}, "failed to bake {}".format(action.name))
-                    continue
+    def _replace_outdated(self, new_action):
+        """Replace the previous bake of the same action and object with new_action, return True if found"""
+        key = (new_action.get("expykit_bake_object"), new_action.get("expykit_bake_source"))
+        old_action = self._bake_index.get(key)
+        self._bake_index[key] = new_action
+
+        if not old_action or old_action == new_action:
+            return False
+
+        old_name = old_action.name
+        old_action.user_remap(new_action)
+        bpy.data.actions.remove(old_action)
+        new_action.name = old_name
+
+        return True
+
+    def _bake_jobs(self, trg_ob, bound_obs):
+        """Yield (source action, [(ob, bone names, new name, bake hash), ...]) for every action of trg_ob
+        to be baked to the armatures in bound_obs
+        """
+        only_actions = set(json.loads(self.only_actions)) if self.only_actions else None
+        if self.skip_unchanged:
+            bound_digests = [self._bound_digest(ob, trg_ob, bone_names) for ob, bone_names in bound_obs]
+
+        for action in list(bpy.data.actions):  # convert to list beforehand to avoid picking new actions
+            if only_actions is not None and action.name not in only_actions:
+                continue
+            if "expykit_bake_hash" in action:
+                # result of a previous bake
+                continue
+            if not validate_action(action, trg_ob.path_resolve):
+                continue
 
+            if self.skip_unchanged:
+                action_digest = self._action_digest(action)
+
+            to_bake = []
+            for i, (ob, bone_names) in enumerate(bound_obs):
                 if trg_ob.name in action.name:
                     new_name = action.name.replace(trg_ob.name, ob.name)
                 else:
                     new_name = "{}|{}".format(ob.name, action.name)
 
-                new_action.name = new_name
-                print("Baked action: {}".format(new_action.name))
+                bake_hash = ""
+                if self.skip_unchanged:
+                    bake_hash = hashlib.sha1(action_digest + bound_digests[i]).hexdigest()
+                    baked = self._bake_index.get((ob.name, action.name))
+                    if baked and baked.get("expykit_bake_hash") == bake_hash:
+                        self._skipped_cnt += 1
+                        continue
+
+                to_bake.append((ob, bone_names, new_name, bake_hash))
 
-                new_action.use_fake_user = self.fake_user_new
-                old_actions.add(new_action)
-                
-                if self.add_to_nla:
-                    if not ob.animation_data:
-                        ob.animation_data_create()
-                    nla_track = ob.animation_data.nla_tracks.new()
-                    nla_track.lock = nla_track.mute = True
-                    nla_track.name = action_base_name(new_action.name)
-                    nla_track.strips.new(nla_track.name, fr_start, new_action)
+            if to_bake:
+                yield action, to_bake
+
+    @staticmethod
+    def _assign_source(trg_ob, action):
+        """Play action on trg_ob, return False if it has no slot for trg_ob"""
+        trg_ob.animation_data.action = action
+
+        try:
+            act_slot = trg_ob.animation_data.action_slot
+        except AttributeError:
+            return True
+
+        act_slot = find_validate_action_slot(action, trg_ob.path_resolve)
+        if not act_slot:
+            return False
+        trg_ob.animation_data.action_slot = act_slot
+
+        return True
+
+    def _finish_job(self, trg_ob, action, to_bake, new_actions):
+        """Store the actions baked from action, return their number"""
+        trg_ob.animation_data.action = None
+        fr_start = action.frame_range[0]
+
+        baked_cnt = 0
+        for (ob, _, new_name, bake_hash), new_action in zip(to_bake, new_actions):
+            if not new_action:
+                self.report({'WARNING'}, "failed to bake {}".format(action.name))
+                continue
+
+            new_action.name = new_name
+            print("Baked action: {}".format(new_action.name))
+            baked_cnt += 1
+
+            if self.reduce_keys:
+                keys_before, keys_after, bone_errors = reduce_action_keys(new_action, self.reduce_tolerance)
+                print_reduction(new_action, bone_errors)
+                self._keys_before += keys_before
+                self._keys_after += keys_after
+
+            new_action.use_fake_user = self.fake_user_new
+            new_action["expykit_bake_source"] = action.name
+            new_action["expykit_bake_object"] = ob.name
+
+            replaced = False
+            if self.skip_unchanged:
+                new_action["expykit_bake_hash"] = bake_hash
+                replaced = self._replace_outdated(new_action)
+
+            if self.add_to_nla and not replaced:
+                self._stash_to_nla(ob, new_action, fr_start)
+
+        if self.clear_users_old:
+            action.user_clear()
+
+        return baked_cnt
+
+    def _bake_bound(self, context, trg_ob, bound_obs):
+        """Bake every action of trg_ob to the armatures bound to it.
+
+        bound_obs is a list of (armature object, bound bone names).
+        All of them are sampled in the same timeline pass, unless Blender Bake is used.
+        Return the number of baked actions
+        """
+        baked_cnt = 0
+        for action, to_bake in self._bake_jobs(trg_ob, bound_obs):
+            if not self._assign_source(trg_ob, action):
+                continue
+
+            fr_start, fr_end = action.frame_range
+            if self.use_nla_bake:
+                new_actions = [self._nla_bake(fr_start, fr_end)]
+            else:
+                new_actions = anim_utils.bake_actions(context, [(ob, bone_names, new_name)
+                                                                for ob, bone_names, new_name, _ in to_bake],
+                                                      int(fr_start), int(fr_end), self.only_moving)
+
+            baked_cnt += self._finish_job(trg_ob, action, to_bake, new_actions)
+
+        return baked_cnt
+
+    @staticmethod
+    def _stash_to_nla(ob, new_action, fr_start):
+        if not ob.animation_data:
+            ob.animation_data_create()
+        nla_track = ob.animation_data.nla_tracks.new()
+        nla_track.lock = nla_track.mute = True
+        nla_track.name = action_base_name(new_action.name)
+        nla_track.strips.new(nla_track.name, fr_start, new_action)
+
+    def _bake_in_workers(self, bound_obs, targets):
+        """Bake actions of the given targets in background processes, return the number of baked actions"""
+        action_names = [action.name for action in bpy.data.actions if "expykit_bake_hash" not in action
+                        and any(validate_action(action, trg_ob.path_resolve) for trg_ob in targets)]
+        options = {
+            "exclude_deform": self.exclude_deform,
+            "group_by_target": self.group_by_target,
+            "only_moving": self.only_moving,
+            "reduce_keys": self.reduce_keys,
+            "reduce_tolerance": self.reduce_tolerance,
+            "skip_unchanged": self.skip_unchanged,
+        }
+        new_actions, stats, failed = bake_pool.bake_in_workers([ob.name for ob, _ in bound_obs], action_names,
+                                                               self.workers, options)
+        self._skipped_cnt += stats.get("skipped", 0)
+        self._keys_before += stats.get("keys_before", 0)
+        self._keys_after += stats.get("keys_after", 0)
+
+        self._not_baked.extend(failed)
+        if failed:
+            self.report({'WARNING'}, "{} actions were not baked, a worker failed (see console): {}".format(
+                len(failed), ", ".join(failed)))
+        if stats.get("missing_stats"):
+            self.report({'WARNING'}, "Counters of {} bake workers are missing, the report is incomplete".format(
+                stats["missing_stats"]))
+
+        for new_action in new_actions:
+            print("Baked action: {}".format(new_action.name))
+            new_action.use_fake_user = self.fake_user_new
+
+            action = bpy.data.actions.get(new_action.get("expykit_bake_source", ""))
+            ob = bpy.data.objects.get(new_action.get("expykit_bake_object", ""))
+            if not action:
+                continue
+
+            replaced = self.skip_unchanged and self._replace_outdated(new_action)
+            if self.add_to_nla and ob and not replaced:
+                self._stash_to_nla(ob, new_action, action.frame_range[0])
+            if self.clear_users_old:
+                action.user_clear()
+
+        return len(new_actions)
+
+    def _init_bake(self):
+        self._keys_before = 0
+        self._keys_after = 0
+        self._skipped_cnt = 0
+        self._not_baked = []
+        self._bake_index = dict()
+        for action in bpy.data.actions:
+            if "expykit_bake_hash" in action:
+                self._bake_index[(action.get("expykit_bake_object"), action.get("expykit_bake_source"))] = action
+
+    def _iter_bound(self, context):
+        """Deselect the selected armatures and yield those bound to another armature,
+        as (armature, target armature, bound bone names)"""
+        sel_obs = list(context.selected_objects)
+        for ob in sel_obs:
+            if bpy.app.version < (2, 80):
+                ob.select = False
+            else:
+                ob.select_set(False)
+
+            trg_ob = self.get_trg_ob(ob)
+            if not trg_ob:
+                continue
+
+            yield ob, trg_ob, self._select_bound_controls(ob, trg_ob, self.exclude_deform)
+
+    @staticmethod
+    def _group_by_target(bound_obs, targets):
+        by_target = dict()
+        for bound, trg_ob in zip(bound_obs, targets):
+            try:
+                by_target[trg_ob].append(bound)
+            except KeyError:
+                by_target[trg_ob] = [bound]
 
-                if self.clear_users_old:
-                    action.user_clear()
+        return by_target
 
-            # delete Constraints
+    @staticmethod
+    def _delete_constraints(bound_obs):
+        for ob, constr_bone_names in bound_obs:
             for bone_name in constr_bone_names:
                 try:
                     pbone = ob.pose.bones[bone_name]
@@ -2485,7 +2916,187 @@ class BakeConstrainedActions(bpy.types.Operator):
                 for constr in reversed(pbone.constraints):
                     pbone.constraints.remove(constr)
 
-        self.report({'INFO'}, "{} new actions were baked".format(len(bpy.data.actions) - old_cnt))
+    def _bake_report(self, baked_cnt):
+        last_bake_stats.clear()
+        last_bake_stats.update(baked=baked_cnt, skipped=self._skipped_cnt,
+                               keys_before=self._keys_before, keys_after=self._keys_after)
+
+        report = "{} new actions were baked".format(baked_cnt)
+        if self._skipped_cnt:
+            report += ", {} unchanged were skipped".format(self._skipped_cnt)
+        if self._keys_before:
+            report += ", " + reduction_report(self._keys_before, self._keys_after)
+
+        return report
+
+    def _bake_all(self, context):
+        """Bake the actions of the selected armatures at once"""
+        self._init_bake()
+        use_workers = self.workers > 1 and not self.use_nla_bake and bpy.app.version >= (2, 80)
+        grouped = use_workers or (self.group_by_target and not self.use_nla_bake)
+
+        baked_cnt = 0
+        bound_obs = []
+        targets = []
+        for ob, trg_ob, constr_bone_names in self._iter_bound(context):
+            bound_obs.append((ob, constr_bone_names))
+            targets.append(trg_ob)
+
+            if not grouped:
+                baked_cnt += self._bake_bound(context, trg_ob, [(ob, constr_bone_names)])
+
+        if use_workers:
+            baked_cnt += self._bake_in_workers(bound_obs, list(set(targets)))
+        elif grouped:
+            for trg_ob, to_bake in self._group_by_target(bound_obs, targets).items():
+                baked_cnt += self._bake_bound(context, trg_ob, to_bake)
+
+        self._delete_constraints(bound_obs)
+        # keep the warning of failed workers in the status bar
+        self.report({'WARNING'} if self._not_baked else {'INFO'}, self._bake_report(baked_cnt))
+
+        return {'FINISHED'}
+
+
+class BakeConstrainedActions(BakeConstrainedBase, bpy.types.Operator):
+    bl_idname = "armature.expykit_bake_constrained_actions"
+    bl_label = "Bake Constrained Actions"
+    bl_description = "Bake Actions constrained from another Armature. No need to select two armatures"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        if not self.do_bake:
+            return {'FINISHED'}
+
+        return self._bake_all(context)
+
+
+@make_annotations
+class BakeConstrainedActionsModal(BakeConstrainedBase, bpy.types.Operator):
+    bl_idname = "armature.expykit_bake_constrained_actions_modal"
+    bl_label = "Bake Constrained Actions (Interactive)"
+    bl_description = "Bake Actions constrained from another Armature a few frames at a time, press Esc to stop"
+    bl_options = {'UNDO'}
+
+    _interactive = True
+
+    frames_per_tick = IntProperty(name="Frames per Update", default=10, min=1,
+                                  description="Frames sampled between two updates of the interface")
+
+    def invoke(self, context, event):
+        # confirming the dialog calls execute on this same instance
+        self._invoked = True
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        if not getattr(self, '_invoked', False):
+            # called from a script or repeated: bake at once, as a modal operator can't be
+            return self._bake_all(context)
+
+        return self._start_modal(context)
+
+    def _start_modal(self, context):
+        """Collect the bake jobs and start sampling them from timer events"""
+        self._init_bake()
+
+        bound_obs = []
+        targets = []
+        for ob, trg_ob, constr_bone_names in self._iter_bound(context):
+            bound_obs.append((ob, constr_bone_names))
+            targets.append(trg_ob)
+
+        if self.group_by_target:
+            groups = self._group_by_target(bound_obs, targets).items()
+        else:
+            groups = [(trg_ob, [bound]) for bound, trg_ob in zip(bound_obs, targets)]
+
+        self._bound_obs = bound_obs
+        self._jobs = [(trg_ob, action, to_bake) for trg_ob, to_bake_obs in groups
+                      for action, to_bake in self._bake_jobs(trg_ob, to_bake_obs)]
+        self._jobs.reverse()  # pop from the end
+
+        self._total_frames = sum(int(action.frame_range[1]) - int(action.frame_range[0]) + 1
+                                 for _, action, _ in self._jobs)
+        self._done_frames = 0
+        self._bone_frames = 0
+        self._bake_time = 0.0
+        self._baked_cnt = 0
+        self._job = None
+        self._steps = None
+
+        wm = context.window_manager
+        wm.progress_begin(0, max(self._total_frames, 1))
+        self._timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+
+        return {'RUNNING_MODAL'}
+
+    def _next_steps(self, context):
+        """Start sampling the next action, return False when there are none left"""
+        while self._jobs:
+            self._job = self._jobs.pop()
+            trg_ob, action, to_bake = self._job
+            fr_start, fr_end = int(action.frame_range[0]), int(action.frame_range[1])
+
+            if not self._assign_source(trg_ob, action):
+                self._done_frames += fr_end - fr_start + 1
+                continue
+
+            self._steps = anim_utils.iter_bake_actions(context, [(ob, bone_names, new_name)
+                                                                 for ob, bone_names, new_name, _ in to_bake],
+                                                       fr_start, fr_end, self.only_moving)
+            self._step_bones = sum(len(bone_names) for _, bone_names, _, _ in to_bake)
+            return True
+
+        return False
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            return self._stop(context, cancelled=True)
+        if event.type != 'TIMER' or event.timer is not self._timer:
+            return {'PASS_THROUGH'}
+
+        tick_start = time.time()
+        for _ in range(self.frames_per_tick):
+            if not self._steps and not self._next_steps(context):
+                self._bake_time += time.time() - tick_start
+                return self._stop(context)
+
+            try:
+                next(self._steps)
+            except StopIteration as stop:
+                trg_ob, action, to_bake = self._job
+                self._baked_cnt += self._finish_job(trg_ob, action, to_bake, stop.value)
+                self._steps = None
+            else:
+                self._done_frames += 1
+                self._bone_frames += self._step_bones
+
+        self._bake_time += time.time() - tick_start
+        context.window_manager.progress_update(self._done_frames)
+
+        return {'RUNNING_MODAL'}
+
+    def _stop(self, context, cancelled=False):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+
+        if self._steps:
+            # drop the partial bake, finished actions are kept
+            self._steps.close()
+            self._job[0].animation_data.action = None
+
+        report = self._bake_report(self._baked_cnt)
+        if self._bake_time > 0.0:
+            report += ", {:.0f} bone frames per second".format(self._bone_frames / self._bake_time)
+
+        if cancelled:
+            # constraints are kept, so that the remaining actions can be baked later
+            self.report({'WARNING'}, "Bake stopped: " + report)
+        else:
+            self._delete_constraints(self._bound_obs)
+            self.report({'INFO'}, report)
 
         return {'FINISHED'}
 
@@ -2511,27 +3122,13 @@ def is_bone_floating(bone, hips_bone_name):
     return True
 
 
-def add_loc_key(bone, frame, options):
-    bone.keyframe_insert('location', index=0, frame=frame, options=options)
-    bone.keyframe_insert('location', index=1, frame=frame, options=options)
-    bone.keyframe_insert('location', index=2, frame=frame, options=options)
+RootMotionSamples = namedtuple('RootMotionSamples', ('hip_mats', 'root_mats', 'root_parent_mats', 'floating_names',
+                                                     'floating_mats', 'floating_parent_mats'))
 
+ROOT_MOTION_CACHE_SIZE = 8
 
-def get_rot_ani_path(to_animate):
-    if to_animate.rotation_mode == 'QUATERNION':
-        return 'rotation_quaternion', 4
-    if to_animate.rotation_mode == 'AXIS_ANGLE':
-        return 'rotation_axis_angle', 4
-
-    return 'rotation_euler', 3
-
-
-def add_loc_rot_key(bone, frame, options):
-    add_loc_key(bone, frame, options)
-
-    mode, channels = get_rot_ani_path(bone)
-    for i in range(channels):
-        bone.keyframe_insert(mode, index=i, frame=frame, options=options)
+# transforms sampled by AddRootMotion, most recently used last
+_root_motion_cache = OrderedDict()
 
 
 @make_annotations
@@ -2593,6 +3190,18 @@ class AddRootMotion(bpy.types.Operator):
     root_cp_rot_y = BoolProperty(name="Root Copy Rot y", description="Copy Root Y Rotation", default=True)
     root_cp_rot_z = BoolProperty(name="Root Copy Rot Z", description="Copy Root Z Rotation", default=False)
 
+    reduce_keys = BoolProperty(name="Reduce Keyframes", default=False,
+                               description="Remove keyframes that linear interpolation can replace")
+
+    reduce_tolerance = FloatProperty(name="Tolerance", default=0.001, min=0.0, precision=4,
+                                     description="Max error of the reduced animation curves")
+
+    batch = BoolProperty(name="All Actions", default=False,
+                         description="Transfer root motion of all the actions compatible with the armature")
+
+    batch_filter = StringProperty(name="Filter", default="",
+                                  description="Only actions whose name contains this text, all if empty")
+
     _armature = None
     _prop_indent = 0.15
 
@@ -2638,6 +3247,13 @@ class AddRootMotion(bpy.types.Operator):
         row.label(text="Suffix:")
         row.prop(self, 'new_anim_suffix', text="")
 
+        row = layout_split(column, factor=self._prop_indent, align=True)
+        row.label(text="")
+        row.prop(self, 'batch')
+        subrow = row.row()
+        subrow.prop(self, 'batch_filter', text="")
+        subrow.enabled = self.batch
+
         column.separator()
 
         row = column.row(align=False)
@@ -2705,6 +3321,14 @@ class AddRootMotion(bpy.types.Operator):
         subcol.enabled = self.root_use_loc_max_z
         row.enabled = self.root_cp_loc_z
 
+        column.separator()
+
+        row = column.row(align=True)
+        row.prop(self, "reduce_keys")
+        subcol = row.column()
+        subcol.prop(self, "reduce_tolerance")
+        subcol.enabled = self.reduce_keys
+
     def _set_defaults(self, rig_settings):
         if not rig_settings:
             return False
@@ -2719,18 +3343,8 @@ class AddRootMotion(bpy.types.Operator):
 
     def invoke(self, context, event):
         """Fill root and hips field according to character settings"""
-        self._rootmo_transfs = []
-        self._rootbo_transfs = []
-        self._hip_bone_transfs = []
-        self._all_floating_mats = []
-
-        self._stored_motion_bone = ""
-        self._stored_motion_type = self.obj_or_bone
-        self._transforms_stored = False
-
         rig_settings = context.object.data.expykit_retarget
-        if self._set_defaults(rig_settings):
-            self._store_transforms(context)
+        self._set_defaults(rig_settings)
 
         return self.execute(context)
 
@@ -2747,58 +3361,156 @@ class AddRootMotion(bpy.types.Operator):
         rig_bones = [arm_ob.pose.bones[b_name] for b_name in skeleton.bone_names() if b_name and consider_bone(b_name)]
         return list([bone for bone in rig_bones if is_bone_floating(bone, self.motion_bone)])
 
-    def _clear_cache(self):
-        self._all_floating_mats.clear()
-        self._hip_bone_transfs.clear()
-        self._rootmo_transfs.clear()
+    def _samples_key(self, context):
+        """Return the cache key of the transforms sampled from the current action"""
+        arm_ob = context.active_object
+        action = arm_ob.animation_data.action
+
+        floating_bones = self._get_floating_bones(context)
+        fcurves = list(get_all_fcurves(action))
+        hasher = hashlib.sha1()
+        anim_utils.update_hash_fcurves(hasher, fcurves)
+        hasher.update(repr([bone.name for bone in floating_bones]).encode())
+
+        # sampled transforms also depend on rest pose and constraints of the sampled bones and their parents,
+        # and on the static object transform
+        sampled_names = []
+        for pose_bone in [arm_ob.pose.bones[self.motion_bone], arm_ob.pose.bones[self.root_motion_bone]] + floating_bones:
+            for bone in [pose_bone] + list(pose_bone.parent_recursive):
+                if bone.name not in sampled_names:
+                    sampled_names.append(bone.name)
+        for bone_name in sampled_names:
+            anim_utils.update_hash_bone(hasher, arm_ob, bone_name)
+        anim_utils.update_hash_object(hasher, arm_ob, set(fc.data_path for fc in fcurves))
+
+        return (arm_ob.name, action.name, self._get_start_end(context), self.motion_bone,
+                self.root_motion_bone, self.obj_or_bone, hasher.hexdigest())
+
+    def _get_samples(self, context):
+        """Return the transforms sampled from the current action, from cache if available"""
+        key = self._samples_key(context)
+        try:
+            samples = _root_motion_cache.pop(key)
+        except KeyError:
+            samples = self._store_transforms(context)
+            while len(_root_motion_cache) >= ROOT_MOTION_CACHE_SIZE:
+                _root_motion_cache.popitem(last=False)
 
-        self._rootbo_transfs.clear()
+        _root_motion_cache[key] = samples
+        return samples
 
     def _store_transforms(self, context):
-        self._clear_cache()
+        """Sample the current action in a single timeline sweep"""
         arm_ob = context.active_object
 
         root_bone = arm_ob.pose.bones[self.root_motion_bone]
         hip_bone = arm_ob.pose.bones[self.motion_bone]
         floating_bones = self._get_floating_bones(context)
 
+        if self.obj_or_bone == 'object':
+            root_parent = arm_ob.parent
+        else:
+            root_parent = root_bone.parent
+
         start, end = self._get_start_end(context)
 
-        current_position = arm_ob.data.pose_position
+        sampled_bones = [hip_bone] + floating_bones + [bone.parent for bone in floating_bones if bone.parent]
+        if self.obj_or_bone == 'bone':
+            sampled_bones.append(root_bone)
+        if self._can_evaluate_fcurves(arm_ob, sampled_bones):
+            return self._evaluate_fcurves(arm_ob, hip_bone, root_bone, floating_bones, sampled_bones, start, end)
+
+        hip_mats = []
+        root_mats = []
+        root_parent_mats = []
+        floating_mats = [[] for _ in floating_bones]
+        floating_parent_mats = [[] if bone.parent else None for bone in floating_bones]
+        for frame_num in range(start, end + 1):
+            context.scene.frame_set(frame_num)
 
-        if self.offset_type == 'start':
-            context.scene.frame_set(start)
-        elif self.offset_type == 'end':
-            context.scene.frame_set(end)
-        else:
-            arm_ob.data.pose_position = 'REST'
+            hip_mats.append(hip_bone.matrix.copy())
+
+            if self.obj_or_bone == 'object':
+                root_mats.append(arm_ob.matrix_world.copy())
+                if root_parent:
+                    root_parent_mats.append(matmul(root_parent.matrix_world, arm_ob.matrix_parent_inverse))
+            else:
+                root_mats.append(root_bone.matrix.copy())
+                if root_parent:
+                    root_parent_mats.append(root_parent.matrix.copy())
+
+            for bone, mats, parent_mats in zip(floating_bones, floating_mats, floating_parent_mats):
+                mats.append(bone.matrix.copy())
+                if bone.parent:
+                    parent_mats.append(bone.parent.matrix.copy())
+
+        return RootMotionSamples(
+            hip_mats=anim_utils.matrix_array(hip_mats),
+            root_mats=anim_utils.matrix_array(root_mats),
+            root_parent_mats=anim_utils.matrix_array(root_parent_mats) if root_parent else None,
+            floating_names=[bone.name for bone in floating_bones],
+            floating_mats=[anim_utils.matrix_array(mats) for mats in floating_mats],
+            floating_parent_mats=[anim_utils.matrix_array(mats) if mats is not None else None
+                                  for mats in floating_parent_mats],
+        )
 
-        start_mat_inverse = hip_bone.matrix.inverted()
+    def _can_evaluate_fcurves(self, arm_ob, pose_bones):
+        """Return True if the pose of pose_bones depends on the active action only, without need for scene evaluation"""
+        if arm_ob.data.pose_position != 'POSE':
+            return False
 
-        context.scene.frame_set(start)
-        arm_ob.data.pose_position = current_position
+        anim_data = arm_ob.animation_data
+        if any(not track.mute for track in anim_data.nla_tracks):
+            return False
+        if getattr(anim_data, 'action_blend_type', 'REPLACE') != 'REPLACE':
+            return False
+        if getattr(anim_data, 'action_influence', 1.0) != 1.0:
+            return False
+        if any(driver.data_path.startswith('pose.bones') for driver in anim_data.drivers):
+            return False
 
-        for frame_num in range(start, end + 1):
-            context.scene.frame_set(frame_num)
+        if self.obj_or_bone == 'object':
+            if arm_ob.parent or any(not constr.mute for constr in arm_ob.constraints):
+                return False
+            if any(arm_ob.delta_location) or any(arm_ob.delta_rotation_euler) \
+                    or tuple(arm_ob.delta_rotation_quaternion) != (1.0, 0.0, 0.0, 0.0) \
+                    or tuple(arm_ob.delta_scale) != (1.0, 1.0, 1.0):
+                return False
+            if any(driver.data_path in ('location', 'rotation_euler', 'rotation_quaternion',
+                                        'rotation_axis_angle', 'scale') for driver in anim_data.drivers):
+                return False
 
-            self._all_floating_mats.append(list([b.matrix.copy() for b in floating_bones]))
-            self._hip_bone_transfs.append(hip_bone.matrix.copy())
-            self._rootmo_transfs.append(matmul(hip_bone.matrix, start_mat_inverse))
+        for pose_bone in pose_bones:
+            if not self._plain_bone(pose_bone):
+                return False
+            if not all(self._plain_bone(parent) for parent in pose_bone.parent_recursive):
+                return False
 
-            if self.obj_or_bone == 'object' and root_bone:
-                self._rootbo_transfs.append(root_bone.matrix.copy())
+        return True
 
-        self._stored_motion_bone = self.motion_bone
-        self._stored_motion_type = self.obj_or_bone
-        self._transforms_stored = True
+    def _evaluate_fcurves(self, arm_ob, hip_bone, root_bone, floating_bones, sampled_bones, start, end):
+        """Sample the current action from its F-Curves, without evaluating the scene"""
+        frames = numpy.arange(start, end + 1, dtype=numpy.float64)
+        fcurves = {(fc.data_path, fc.array_index): fc for fc in get_all_fcurves(arm_ob.animation_data.action)}
 
-    def _cache_dirty(self):
-        if self._stored_motion_bone != self.motion_bone:
-            return True
-        if self._stored_motion_type != self.obj_or_bone:
-            return True
+        # parents are evaluated along with their children
+        pose_mats = anim_utils.fk_pose_matrices(arm_ob, fcurves, [bone.name for bone in sampled_bones], frames)
 
-        return False
+        if self.obj_or_bone == 'object':
+            root_mats = anim_utils.transform_basis_matrices(arm_ob, fcurves, frames)
+            root_parent_mats = None
+        else:
+            root_mats = pose_mats[root_bone.name]
+            root_parent_mats = pose_mats[root_bone.parent.name] if root_bone.parent else None
+
+        return RootMotionSamples(
+            hip_mats=pose_mats[hip_bone.name],
+            root_mats=root_mats,
+            root_parent_mats=root_parent_mats,
+            floating_names=[bone.name for bone in floating_bones],
+            floating_mats=[pose_mats[bone.name] for bone in floating_bones],
+            floating_parent_mats=[pose_mats[bone.parent.name] if bone.parent else None for bone in floating_bones],
+        )
 
     def execute(self, context):
         rig_settings = context.object.data.expykit_retarget
@@ -2811,6 +3523,52 @@ class AddRootMotion(bpy.types.Operator):
             return {'FINISHED'}
 
         armature = context.active_object
+        rest_mats = dict(zip(armature.data.bones.keys(),
+                             anim_utils.matrix_array([bone.matrix_local for bone in armature.data.bones])))
+
+        if not self.batch:
+            self._transfer(context, rest_mats)
+            return {'FINISHED'}
+
+        current_action = armature.animation_data.action
+        to_transfer = [action for action in bpy.data.actions if self._batch_candidate(action, armature)]
+
+        batch_start = time.time()
+        for action in to_transfer:
+            clip_start = time.time()
+            armature.animation_data.action = action
+            try:
+                act_slot = armature.animation_data.action_slot
+            except AttributeError:
+                pass
+            else:
+                act_slot = find_validate_action_slot(action, armature.path_resolve)
+                if act_slot:
+                    armature.animation_data.action_slot = act_slot
+
+            self._transfer(context, rest_mats)
+            self.report({'INFO'}, "{}: {:.2f}s".format(action.name, time.time() - clip_start))
+
+        armature.animation_data.action = current_action
+        self.report({'INFO'}, "Root motion transferred to {} actions in {:.2f}s".format(len(to_transfer),
+                                                                                     time.time() - batch_start))
+
+        return {'FINISHED'}
+
+    def _batch_candidate(self, action, armature):
+        if self.batch_filter and self.batch_filter not in action.name:
+            return False
+        if self.new_anim_suffix and action.name.endswith(self.new_anim_suffix):
+            # result of a previous transfer
+            return False
+
+        return validate_action(action, armature.path_resolve)
+
+    def _transfer(self, context, rest_mats):
+        """Transfer root motion of the current action"""
+        armature = context.active_object
+        samples = self._get_samples(context)
+
         if self.new_anim_suffix:
             action_dupli = armature.animation_data.action.copy()
 
@@ -2819,14 +3577,14 @@ class AddRootMotion(bpy.types.Operator):
             action_dupli.use_fake_user = armature.animation_data.action.use_fake_user
             armature.animation_data.action = action_dupli
 
-        if self._cache_dirty():
-            self._store_transforms(context)
+        written = self.action_offs(context, samples, rest_mats)
 
-        if not self._transforms_stored:
-            self.report({'WARNING'}, "No transforms stored")
-
-        self.action_offs(context)
-        return {'FINISHED'}
+        if self.reduce_keys:
+            # only the root and floating bones keys written above, other curves may be hand made
+            action = armature.animation_data.action
+            keys_before, keys_after, bone_errors = reduce_action_keys(action, self.reduce_tolerance, written)
+            print_reduction(action, bone_errors)
+            self.report({'INFO'}, "{}: {}".format(action.name, reduction_report(keys_before, keys_after)))
 
     @staticmethod
     def _get_start_end(context):
@@ -2835,150 +3593,168 @@ class AddRootMotion(bpy.types.Operator):
 
         return int(start), int(end)
 
-    def action_offs(self, context):
+    def _root_motion(self, samples, offset_mat):
+        """Return the root matrices for each stored frame"""
+        copy_loc = (self.root_cp_loc_x, self.root_cp_loc_y, self.root_cp_loc_z)
+        loc_min = (self.root_loc_min_x if self.root_use_loc_min_x else None,
+                   self.root_loc_min_y if self.root_use_loc_min_y else None,
+                   self.root_loc_min_z if self.root_use_loc_min_z else None)
+        loc_max = (self.root_loc_max_x if self.root_use_loc_max_x else None,
+                   self.root_loc_max_y if self.root_use_loc_max_y else None,
+                   self.root_loc_max_z if self.root_use_loc_max_z else None)
+        copy_rot = (self.root_cp_rot_x, self.root_cp_rot_y, self.root_cp_rot_z)
+
+        return anim_utils.root_motion_matrices(samples.hip_mats, samples.root_mats, offset_mat,
+                                               copy_loc, loc_min, loc_max, copy_rot)
+
+    def action_offs(self, context, samples, rest_mats):
         start, end = self._get_start_end(context)
         current = context.scene.frame_current
+        frames = list(range(start, end + 1))
 
-        hips_bone_name = self.motion_bone
-        hip_bone = context.active_object.pose.bones[hips_bone_name]
-
-        if self.keep_offset and self.offset_type == 'end':
-            context.scene.frame_set(end)
-            end_mat = hip_bone.matrix.copy()
-        else:
-            end_mat = Matrix()
-
-        context.scene.frame_set(start)
-        start_mat = hip_bone.matrix.copy()
-        start_mat_inverse = start_mat.inverted()
+        arm_ob = context.active_object
+        action = arm_ob.animation_data.action
+        hip_bone = arm_ob.pose.bones[self.motion_bone]
 
         if self.keep_offset:
             if self.offset_type == 'rest':
-                offset_mat = context.active_object.data.bones[hip_bone.name].matrix_local.inverted()
+                offset_mat = numpy.linalg.inv(rest_mats[hip_bone.name])
             elif self.offset_type == 'start':
-                offset_mat = start_mat_inverse
+                offset_mat = numpy.linalg.inv(samples.hip_mats[0])
             elif self.offset_type == 'end':
-                offset_mat = end_mat.inverted()
+                offset_mat = numpy.linalg.inv(samples.hip_mats[-1])
         else:
-            offset_mat = Matrix()
+            offset_mat = numpy.identity(4)
 
         root_bone_name = self.root_motion_bone
 
         if self.obj_or_bone == 'object':
-            root_bone = context.active_object
+            root_bone = arm_ob
         else:
             try:
-                root_bone = context.active_object.pose.bones[root_bone_name]
+                root_bone = arm_ob.pose.bones[root_bone_name]
             except (TypeError, KeyError):
                 self.report({'WARNING'}, "{} not found in target".format(root_bone_name))
-                return {'FINISHED'}
-
-        bpy.context.scene.frame_set(start)
-        keyframe_options = {'INSERTKEY_VISUAL', 'INSERTKEY_CYCLE_AWARE'}
-        add_loc_rot_key(root_bone, start, keyframe_options)
+                return []
 
-        root_matrix = root_bone.matrix if self.obj_or_bone == 'bone' else context.active_object.matrix_world
-        for i, frame_num in enumerate(range(start, end + 1)):
-            bpy.context.scene.frame_set(frame_num)
-
-            rootmo_transf = matmul(self._hip_bone_transfs[i], offset_mat)
-            if self.root_cp_loc_x:
-                if self.root_use_loc_min_x:
-                    rootmo_transf[0][3] = max(rootmo_transf[0][3], self.root_loc_min_x)
-                if self.root_use_loc_max_x:
-                    rootmo_transf[0][3] = min(rootmo_transf[0][3], self.root_loc_max_x)
-            else:
-                rootmo_transf[0][3] = root_matrix[0][3]
-            if self.root_cp_loc_y:
-                if self.root_use_loc_min_y:
-                    rootmo_transf[1][3] = max(rootmo_transf[1][3], self.root_loc_min_y)
-                if self.root_use_loc_max_y:
-                    rootmo_transf[1][3] = min(rootmo_transf[1][3], self.root_loc_max_y)
+        root_mats = self._root_motion(samples, offset_mat)
+        if self.obj_or_bone == 'object':
+            if samples.root_parent_mats is None:
+                basis_mats = root_mats
             else:
-                rootmo_transf[1][3] = root_matrix[1][3]
-            if self.root_cp_loc_z:
-                if self.root_use_loc_min_z:
-                    rootmo_transf[2][3] = max(rootmo_transf[2][3], self.root_loc_min_z)
-                if self.root_use_loc_max_z:
-                    rootmo_transf[2][3] = min(rootmo_transf[2][3], self.root_loc_max_z)
+                basis_mats = numpy.matmul(numpy.linalg.inv(samples.root_parent_mats), root_mats)
+            written = anim_utils.write_transform_keys(action, arm_ob, frames, basis_mats, arm_ob.rotation_mode)
+        else:
+            rest = rest_mats[root_bone.name]
+            if samples.root_parent_mats is None:
+                basis_mats = anim_utils.pose_to_basis(root_mats, rest)
             else:
-                rootmo_transf[2][3] = root_matrix[2][3]
+                parent_rest = rest_mats[root_bone.parent.name]
+                basis_mats = anim_utils.pose_to_basis(root_mats, rest, samples.root_parent_mats, parent_rest)
+            written = anim_utils.write_transform_keys(action, arm_ob, frames, basis_mats, root_bone.rotation_mode,
+                                                      bone_name=root_bone.name)
+
+        floating_bones = [arm_ob.pose.bones[b_name] for b_name in samples.floating_names]
+        if self._can_compensate(arm_ob, floating_bones):
+            floating_basis = self._floating_basis(arm_ob, floating_bones, samples, rest_mats, root_mats)
+        else:
+            # keys were set in bulk: the evaluated pose must not come from the previous action data
+            for fcurve in written:
+                fcurve.update()
+            action.update_tag()
+            floating_basis = self._floating_basis_sweep(context, floating_bones, samples, frames)
 
-            if not all((self.root_cp_rot_x, self.root_cp_rot_y, self.root_cp_rot_z)):
-                if self.root_cp_rot_x + self.root_cp_rot_y + self.root_cp_rot_z < 2:
-                    # need at least two axis to make this work, don't use rotation
-                    no_rot = Matrix()
-                    no_rot[0][3] = rootmo_transf[0][3]
-                    no_rot[1][3] = rootmo_transf[1][3]
-                    no_rot[2][3] = rootmo_transf[2][3]
+        for bone, basis_mats in zip(floating_bones, floating_basis):
+            written.extend(anim_utils.write_transform_keys(action, arm_ob, frames, basis_mats,
+                                                           bone.rotation_mode, bone_name=bone.name))
 
-                    rootmo_transf = no_rot
-                else:
-                    rootmo_transf.transpose()
-                    root_transp = root_matrix.transposed()
-
-                    if not self.root_cp_rot_z:
-                        # XY plane
-                        rootmo_transf[1][2] = root_transp[1][2]
-                        rootmo_transf[0][2] = root_transp[0][2]
-
-                        y_axis = rootmo_transf[1].to_3d()
-                        y_axis.normalize()
-
-                        x_axis = y_axis.cross(root_transp[2].to_3d())
-                        x_axis.normalize()
-
-                        z_axis = x_axis.cross(y_axis)
-                        z_axis.normalize()
-                    elif not self.root_cp_rot_x:
-                        # ZY plane
-                        rootmo_transf[1][0] = root_transp[1][0]
-                        rootmo_transf[2][0] = root_transp[2][0]
-
-                        z_axis = rootmo_transf[2].to_3d().normalized()
-                        up = root_transp[1].to_3d()
-                        x_axis = up.cross(z_axis).normalized()
-                        y_axis = z_axis.cross(x_axis)
-                        y_axis.normalize()
-                    else:
-                        # XZ plane
-                        rootmo_transf[2][1] = root_transp[2][1]
-                        rootmo_transf[0][1] = root_transp[0][1]
+        bpy.context.scene.frame_set(current)
+        return written
 
-                        z_axis = rootmo_transf[2].to_3d().normalized()
-                        up = root_transp[1].to_3d()
-                        x_axis = up.cross(z_axis).normalized()
-                        y_axis = z_axis.cross(x_axis)
+    @staticmethod
+    def _plain_bone(pose_bone):
+        """Return True if the pose of pose_bone follows its parent and its own channels only"""
+        if any(not constr.mute for constr in pose_bone.constraints):
+            return False
 
-                    rootmo_transf[0] = x_axis.to_4d()
-                    rootmo_transf[1] = y_axis.to_4d()
-                    rootmo_transf[2] = z_axis.to_4d()
+        bone = pose_bone.bone
+        if not bone.use_inherit_rotation or not bone.use_local_location:
+            return False
+        try:
+            return bone.inherit_scale == 'FULL'
+        except AttributeError:
+            # blender < 2.81
+            return bone.use_inherit_scale
+
+    def _can_compensate(self, arm_ob, floating_bones):
+        """Return True if the floating bones can be compensated from the stored matrices alone"""
+        if self.obj_or_bone == 'bone' and not self._plain_bone(arm_ob.pose.bones[self.root_motion_bone]):
+            return False
 
-                    rootmo_transf.transpose()
+        for bone in floating_bones:
+            if not self._plain_bone(bone):
+                return False
 
-            if self.obj_or_bone == 'object':
-                root_bone.matrix_world = rootmo_transf
-            else:
-                root_bone.matrix = rootmo_transf
-            add_loc_rot_key(root_bone, frame_num, keyframe_options)
+            parent = bone.parent
+            while parent and parent.name != self.root_motion_bone:
+                if not self._plain_bone(parent):
+                    return False
+                parent = parent.parent
 
-        floating_bones = self._get_floating_bones(context)
-        for i, frame_num in enumerate(range(start, end + 1)):
-            bpy.context.scene.frame_set(frame_num)
+        return True
+
+    def _floating_basis(self, arm_ob, floating_bones, samples, rest_mats, root_mats):
+        """Return the basis matrices keeping the floating bones in place, computed from the stored matrices"""
+        if self.obj_or_bone == 'object':
+            # root motion goes to the object: keep the floating bones where they were in world space
+            inv_root_mats = numpy.linalg.inv(root_mats)
+            pose_mats = [numpy.matmul(inv_root_mats, mats) for mats in samples.floating_mats]
+            changed = dict()
+        else:
+            pose_mats = samples.floating_mats
+            changed = {self.root_motion_bone: numpy.matmul(root_mats, numpy.linalg.inv(samples.root_mats))}
+
+        # change of the floating bones, carried over to their children
+        for bone, new_mats, old_mats in zip(floating_bones, pose_mats, samples.floating_mats):
+            changed[bone.name] = numpy.matmul(new_mats, numpy.linalg.inv(old_mats))
+
+        floating_basis = []
+        for bone, mats, parent_mats in zip(floating_bones, pose_mats, samples.floating_parent_mats):
+            rest = rest_mats[bone.name]
+            parent = bone.parent
+            if not parent:
+                floating_basis.append(anim_utils.pose_to_basis(mats, rest))
+                continue
 
-            if self.obj_or_bone == 'object' and self.root_motion_bone:
-                context.active_object.pose.bones[self.root_motion_bone].matrix = matmul(root_bone.matrix_world.inverted(), context.active_object.pose.bones[self.root_motion_bone].matrix)
+            new_parent_mats = parent_mats
+            for ancestor in [parent] + list(parent.parent_recursive):
+                if ancestor.name in changed:
+                    new_parent_mats = numpy.matmul(changed[ancestor.name], parent_mats)
+                    break
+
+            parent_rest = rest_mats[parent.name]
+            floating_basis.append(anim_utils.pose_to_basis(mats, rest, new_parent_mats, parent_rest))
+
+        return floating_basis
+
+    def _floating_basis_sweep(self, context, floating_bones, samples, frames):
+        """Return the basis matrices keeping the floating bones in place, evaluating the new root motion"""
+        arm_ob = context.active_object
+        floating_basis = [[] for _ in floating_bones]
+        for i, frame_num in enumerate(frames):
+            # in object mode the root bone is left as is, like in _floating_basis
+            bpy.context.scene.frame_set(frame_num)
 
-            floating_mats = self._all_floating_mats[i]
-            for bone, mat in zip(floating_bones, floating_mats):
+            for bone, mats, basis in zip(floating_bones, samples.floating_mats, floating_basis):
+                mat = Matrix(mats[i].tolist())
                 if self.obj_or_bone == 'object':
                     # TODO: should get matrix at frame 0
-                    mat = matmul(root_bone.matrix_world.inverted(), mat)
+                    mat = matmul(arm_ob.matrix_world.inverted(), mat)
 
                 bone.matrix = mat
-                add_loc_rot_key(bone, frame_num, set())
+                basis.append(bone.matrix_basis.copy())
 
-        bpy.context.scene.frame_set(current)
+        return [anim_utils.matrix_array(basis) for basis in floating_basis]
 
 
 @make_annotations
@@ -2986,6 +3762,10 @@ class ActionNameCandidates(bpy.types.PropertyGroup):
     name = bpy.props.StringProperty(name="Name Candidate", default="")
 
 
+# samples of the hips motion compared by RenameActionsFromFbxFiles
+MOTION_SAMPLES = 32
+
+
 @make_annotations
 class RenameActionsFromFbxFiles(bpy.types.Operator, ImportHelper):
     bl_idname = "armature.expykit_rename_actions_fbx"
@@ -3006,28 +3786,66 @@ class RenameActionsFromFbxFiles(bpy.types.Operator, ImportHelper):
     contains = StringProperty(name="Containing", default="|")
     starts_with = StringProperty(name="Starting with", default="Action")
 
+    scan_threads = IntProperty(name="Scan Threads", default=8, min=1, max=64,
+                               description="Number of .fbx files read at the same time")
+    tolerance = FloatProperty(name="Tolerance", default=0.001, min=0.0, precision=4,
+                              description="Largest difference in seconds between matching action and file durations")
+    match_motion = BoolProperty(name="Compare Motion", default=False,
+                                description="Among files of matching duration, pick the one with the closest hips motion")
+
+    @staticmethod
+    def _motion_bone(ob):
+        hips = ob.data.expykit_retarget.spine.hips
+        if hips and hips in ob.pose.bones:
+            return ob.pose.bones[hips]
+
+        return next((pose_bone for pose_bone in ob.pose.bones if not pose_bone.parent), None)
+
+    def _file_fingerprints(self, fbx_paths, bone_name, fbx_cache):
+        """Return the motion fingerprints of fbx_paths, one row per file, rows of inf for files without motion"""
+        fingerprints = numpy.full((len(fbx_paths), 2 * (MOTION_SAMPLES - 1)), numpy.inf)
+        rows = {fbx_path: i for i, fbx_path in enumerate(fbx_paths)}
+        scales = numpy.ones((MOTION_SAMPLES, 3))
+
+        for fbx_path, samples in fbx_helper.scan_bone_samples(fbx_paths, bone_name, MOTION_SAMPLES,
+                                                              self.scan_threads, cache=fbx_cache):
+            if not samples:
+                continue
+
+            rotations = anim_utils.rotation_matrices(samples["rotation"], samples["rotation_order"])
+            matrices = anim_utils.compose_matrices(samples["location"], rotations, scales)
+            fingerprints[rows[fbx_path]] = anim_utils.motion_fingerprint(matrices)
+
+        return fingerprints
+
+    @staticmethod
+    def _action_fingerprint(action, pose_bone, start, end):
+        fcurves = {(fc.data_path, fc.array_index): fc for fc in get_all_fcurves(action)}
+        frames = numpy.linspace(start, end, MOTION_SAMPLES)
+        matrices = anim_utils.transform_basis_matrices(pose_bone, fcurves, frames,
+                                                       path_prefix=anim_utils.pose_bone_path(pose_bone.name, ""))
+        return anim_utils.motion_fingerprint(matrices)
+
     def execute(self, context):
-        fbx_durations = dict()
-        for f in self.files:
-            fbx_path = os.path.join(self.directory, f.name)
-            local_time = fbx_helper.get_fbx_local_time(fbx_path)
+        fbx_paths = {os.path.join(self.directory, f.name): f.name for f in self.files}
+
+        fbx_cache = fbx_helper.FbxMetadataCache(preset_handler.get_fbx_cache_path())
+        fbx_durations = []
+        for fbx_path, local_time in fbx_helper.scan_local_times(list(fbx_paths.keys()), self.scan_threads,
+                                                                cache=fbx_cache):
             if not local_time:
                 continue
 
             duration = fbx_helper.convert_from_fbx_duration(*local_time)
-            duration = round(duration, 5)
-            duration = str(duration)
-            action_name = os.path.splitext(f.name[:-3])[0]
+            action_name = os.path.splitext(fbx_paths[fbx_path][:-3])[0]
+            fbx_durations.append((duration, action_name, fbx_path))
 
-            try:
-                fbx_durations[duration].append(action_name)
-            except KeyError:  # entry doesn'exist yet
-                fbx_durations[duration] = action_name
-            except AttributeError:  # existing entry is not a list
-                current = fbx_durations[duration]
-                fbx_durations[duration] = [current, action_name]
+        # sorted by duration, files complete in any order
+        fbx_durations.sort()
+        durations = [duration for duration, _, _ in fbx_durations]
 
         path_resolve = context.object.path_resolve
+        to_rename = []
         for action in bpy.data.actions:
             skip_action = True
 
@@ -3045,23 +3863,52 @@ class RenameActionsFromFbxFiles(bpy.types.Operator, ImportHelper):
             start, end = action.frame_range
             ac_duration = end - start
             ac_duration /= context.scene.render.fps
-            ac_duration = round(ac_duration, 5)
-            ac_duration = str(ac_duration)
 
-            try:
-                fbx_match = fbx_durations[ac_duration]
-            except KeyError:
+            lo = bisect.bisect_left(durations, ac_duration - self.tolerance)
+            hi = bisect.bisect_right(durations, ac_duration + self.tolerance)
+            if lo == hi:
                 continue
 
-            if not fbx_match:
+            to_rename.append((hi - lo, action, ac_duration, lo, hi))
+
+        # single matches first, the files they take are not candidates of the others
+        to_rename.sort(key=lambda item: item[0])
+
+        motion_bone = self._motion_bone(context.object) if self.match_motion else None
+        if motion_bone:
+            # only the files of ambiguous buckets are compared
+            rows = sorted(set(row for count, _, _, lo, hi in to_rename if count > 1 for row in range(lo, hi)))
+            fingerprints = numpy.full((len(fbx_durations), 2 * (MOTION_SAMPLES - 1)), numpy.inf)
+            fingerprints[rows] = self._file_fingerprints([fbx_durations[row][2] for row in rows],
+                                                         motion_bone.name, fbx_cache)
+
+        matched = numpy.zeros(len(fbx_durations), dtype=bool)
+        for _, action, ac_duration, lo, hi in to_rename:
+            rows = [row for row in range(lo, hi) if not matched[row]]
+            if not rows:
                 continue
-            if isinstance(fbx_match, list):
-                for name in fbx_match:
+
+            if motion_bone and len(rows) > 1:
+                # files of the same duration are contiguous: compare the whole bucket at once
+                start, end = action.frame_range
+                fingerprint = self._action_fingerprint(action, motion_bone, start, end)
+                distances = numpy.linalg.norm(fingerprints[rows] - fingerprint, axis=1)
+                best = int(numpy.argmin(distances))
+                if numpy.isfinite(distances[best]):
+                    rows = [rows[best]]
+
+            if len(rows) > 1:
+                # closest first
+                rows.sort(key=lambda row: abs(durations[row] - ac_duration))
+                for row in rows:
                     entry = action.expykit_name_candidates.add()
-                    entry.name = name
+                    entry.name = fbx_durations[row][1]
                 continue
 
-            action.name = fbx_match
+            action.name = fbx_durations[rows[0]][1]
+            matched[rows[0]] = True
+
+        fbx_cache.save()
 
         return {'FINISHED'}
 
@@ -3080,6 +3927,7 @@ def register_classes():
     if bpy.app.version < (2, 79):
         bpy.utils.register_class(ConstrainActiveToSelected)
     bpy.utils.register_class(BakeConstrainedActions)
+    bpy.utils.register_class(BakeConstrainedActionsModal)
     bpy.utils.register_class(RenameActionsFromFbxFiles)
     bpy.utils.register_class(CreateTransformOffset)
     bpy.utils.register_class(AddRootMotion)
@@ -3087,8 +3935,15 @@ def register_classes():
 
     bpy.types.Action.expykit_name_candidates = bpy.props.CollectionProperty(type=ActionNameCandidates)
 
+    if bpy.app.version >= (2, 80):
+        bpy.app.handlers.depsgraph_update_post.append(_drop_updated_actions)
+
 
 def unregister_classes():
+    if _drop_updated_actions in getattr(bpy.app.handlers, 'depsgraph_update_post', ()):
+        bpy.app.handlers.depsgraph_update_post.remove(_drop_updated_actions)
+    _action_index.clear()
+
     del bpy.types.Action.expykit_name_candidates
 
     bpy.utils.unregister_class(AnimationSetStatus)
@@ -3103,6 +3958,7 @@ def unregister_classes():
     if bpy.app.version < (2, 79):
         bpy.utils.unregister_class(ConstrainActiveToSelected)
     bpy.utils.unregister_class(ConstrainToArmature)
+    bpy.utils.unregister_class(BakeConstrainedActionsModal)
     bpy.utils.unregister_class(BakeConstrainedActions)
     bpy.utils.unregister_class(RenameActionsFromFbxFiles)
     bpy.utils.unregister_class(CreateTransformOffset)
@@ -24,6 +24,33 @@ class ExpyToClipboard(bpy.types.Operator):
         return {'FINISHED'}
 
 
+class ExpyPresetsToJson(bpy.types.Operator):
+    """Write the stored rig presets as data-only .json presets"""
+    bl_idname = "wm.expy_presets_to_json"
+    bl_label = "Convert Presets to .json"
+
+    def execute(self, context):
+        retarget_dir = preset_handler.get_retarget_dir()
+        converted = []
+        failed = []
+        for f in sorted(os.listdir(retarget_dir)):
+            if not f.endswith('.py'):
+                continue
+            if preset_handler.convert_preset_to_json(os.path.join(retarget_dir, f)):
+                converted.append(f)
+            else:
+                failed.append(f)
+
+        preset_handler.preset_catalog.reload()
+        if failed:
+            self.report({'WARNING'}, "{} presets converted, {} are not plain assignments: {}".format(
+                len(converted), len(failed), ", ".join(failed)))
+        else:
+            self.report({'INFO'}, "{} presets converted".format(len(converted)))
+
+        return {'FINISHED'}
+
+
 class ExpyPrefs(bpy.types.AddonPreferences):
     bl_idname = __package__
 
@@ -60,12 +87,20 @@ class ExpyPrefs(bpy.types.AddonPreferences):
         op = sp_col.operator(ExpyToClipboard.bl_idname, text='Path of stored rig presets')
         op.clip_text = preset_handler.get_retarget_dir()
 
+        row = col.row()
+        split = layout_split(row, factor=0.15, align=False)
+        sp_col = split.column()
+        sp_col = split.column()
+        sp_col.operator(ExpyPresetsToJson.bl_idname)
+
 
 def register_classes():
     bpy.utils.register_class(ExpyPrefs)
     bpy.utils.register_class(ExpyToClipboard)
+    bpy.utils.register_class(ExpyPresetsToJson)
 
 
 def unregister_classes():
     bpy.utils.unregister_class(ExpyPrefs)
     bpy.utils.unregister_class(ExpyToClipboard)
+    bpy.utils.unregister_class(ExpyPresetsToJson)
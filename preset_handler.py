@@ -1,13 +1,19 @@
 import ast
+import hashlib
 import importlib.util
+import json
 import os
 import shutil
+import time
+from collections import OrderedDict
 
 import bpy
 from .rig_mapping.bone_mapping import HumanFingers, HumanSpine, HumanLeg, HumanArm, HumanSkeleton, SimpleFace
 
 
 PRESETS_SUBDIR = os.path.join("armature", "retarget")
+# script presets and data-only presets, mapping slot paths to bone names
+PRESET_EXTENSIONS = ('.py', '.json')
 
 
 def get_retarget_dir():
@@ -17,40 +23,147 @@ def get_retarget_dir():
     return retarget_dir
 
 
+def get_preset_path(preset):
+    """Full path of a preset file. A .json preset takes precedence over the .py preset of the same name,
+    which is kept for the preset menu and for the settings that refer to it"""
+    preset_path = os.path.join(get_retarget_dir(), preset)
+    json_path = os.path.splitext(preset_path)[0] + '.json'
+    if os.path.isfile(json_path):
+        return json_path
+
+    return preset_path
+
+
+def get_fbx_cache_path():
+    """Path of the .fbx metadata cache, next to the presets directory"""
+    presets_dir = bpy.utils.user_resource('SCRIPTS', path="presets")
+    return os.path.join(presets_dir, "expykit_fbx_cache.json")
+
+
+# bundled presets installed so far, by file name: size, mtime and hash of the bundled file, size and mtime of the copy
+INSTALL_MANIFEST = ".install_manifest"
+
+
+def _file_hash(filepath):
+    with open(filepath, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
 def install_presets():
+    """Copy the bundled presets to the user presets, only those that are new or changed since last install.
+
+    Nothing is written when all presets are up to date
+    """
     retarget_dir = get_retarget_dir()
     bundled_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "rig_mapping", "presets")
+    manifest_path = os.path.join(retarget_dir, INSTALL_MANIFEST)
 
-    os.makedirs(retarget_dir, exist_ok=True)
-    for f in os.listdir(bundled_dir):
-        shutil.copy2(os.path.join(bundled_dir, f), retarget_dir)
+    try:
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        manifest = {}
 
+    changed = False
+    for f in os.listdir(bundled_dir):
+        bundled_path = os.path.join(bundled_dir, f)
+        if not os.path.isfile(bundled_path):
+            continue
 
-def iterate_presets_with_current(scene, context):
-    """CallBack for Enum Property. Must take scene, context arguments"""
+        stat = os.stat(bundled_path)
+        entry = manifest.get(f)
+        bundled_unchanged = entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime
+        content_hash = entry["hash"] if bundled_unchanged else _file_hash(bundled_path)
 
-    yield '--', "--", "None"  # first menu entry, doesn't do anything
-    yield "--Current--", "-- Current Settings --", "Use Bones set in Expy Retarget Panel"
+        installed_path = os.path.join(retarget_dir, f)
+        try:
+            installed = os.stat(installed_path)
+        except OSError:
+            installed = None
 
-    _dir = get_retarget_dir()
-    if os.path.isdir(_dir):
-        for f in os.listdir(_dir):
-            if not f.endswith('.py'):
+        if (entry and entry["hash"] == content_hash and installed
+                and installed.st_size == entry["installed_size"] and installed.st_mtime == entry["installed_mtime"]):
+            if bundled_unchanged:
                 continue
-            yield f, os.path.splitext(f)[0].title(), ""
+            # touched, but same content: only the manifest needs an update
+        else:
+            os.makedirs(retarget_dir, exist_ok=True)
+            shutil.copy2(bundled_path, retarget_dir)
+            installed = os.stat(installed_path)
 
+        manifest[f] = {"size": stat.st_size, "mtime": stat.st_mtime, "hash": content_hash,
+                       "installed_size": installed.st_size, "installed_mtime": installed.st_mtime}
+        changed = True
 
-def iterate_presets(scene, context):
+    if changed:
+        with open(manifest_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+
+    preset_catalog.reload()
+
+
+class PresetCatalog:
+    """Enum items of the presets in the retarget directory.
+
+    The directory is listed again only when its mtime changes, checked at most once every refresh_interval
+    seconds, or on reload(). Items are kept alive here, as Blender requires for dynamic enums
+    """
+
+    def __init__(self, refresh_interval=2.0):
+        self.refresh_interval = refresh_interval
+        self._mtime = None
+        self._checked = 0.0
+        self.presets = []
+        self.items = [('--', "--", "None")]
+        self.items_with_current = list(self.items)
+
+    def reload(self):
+        """List the directory on next access"""
+        self._mtime = None
+        self._checked = 0.0
+
+    def refresh(self):
+        now = time.monotonic()
+        if self._mtime is not None and now - self._checked < self.refresh_interval:
+            return
+        self._checked = now
+
+        _dir = get_retarget_dir()
+        try:
+            mtime = os.stat(_dir).st_mtime
+        except OSError:
+            mtime = -1.0
+
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+
+        files = set(os.listdir(_dir)) if mtime >= 0.0 else set()
+        # a .json preset converted from a .py one is listed only once, under the .py name: see get_preset_path
+        self.presets = sorted(f for f in files if f.endswith('.py')
+                              or f.endswith('.json') and os.path.splitext(f)[0] + '.py' not in files)
+
+        none_item = ('--', "--", "None")  # first menu entry, doesn't do anything
+        current_item = ("--Current--", "-- Current Settings --", "Use Bones set in Expy Retarget Panel")
+        preset_items = [(f, os.path.splitext(f)[0].title(), "") for f in self.presets]
+
+        self.items = [none_item] + preset_items
+        self.items_with_current = [none_item, current_item] + preset_items
+
+
+preset_catalog = PresetCatalog()
+
+
+def iterate_presets_with_current(scene, context):
     """CallBack for Enum Property. Must take scene, context arguments"""
+    preset_catalog.refresh()
+    return preset_catalog.items_with_current
 
-    yield '--', "--", "None"  # first menu entry, doesn't do anything
 
-    _dir = get_retarget_dir()
-    if os.path.isdir(_dir):
-        for f in os.listdir(_dir):
-            if not f.endswith('.py'):
-                continue
-            yield f, os.path.splitext(f)[0].title(), ""
+def iterate_presets(scene, context):
+    """CallBack for Enum Property. Must take scene, context arguments"""
+    preset_catalog.refresh()
+    return preset_catalog.items
 
 
 def get_settings_skel(settings):
@@ -75,6 +188,93 @@ bone_name_synonyms = {
     'left_leg_ik.toe' : (('toe.L', 'toe_ik.L'),),
     }
 
+# preset values that are not bone names
+NON_BONE_SLOTS = ('deform_preset', 'last_used_preset')
+
+
+def normalize_bone_name(name, separator=':'):
+    """Bone name without namespace prefix, as compared by the preset detection"""
+    return name.rsplit(separator, 1)[-1].lower()
+
+
+class PresetIndex:
+    """Inverted index from normalized bone name to the (preset, slot) pairs that use it.
+
+    Built from the compiled presets of the catalog, and again only when one of them changes
+    """
+
+    def __init__(self):
+        self._key = None
+        self.bone_slots = dict()
+        self.slot_counts = dict()
+
+    def refresh(self, separator=':'):
+        preset_catalog.refresh()
+        preset_paths = [get_preset_path(preset) for preset in preset_catalog.presets]
+
+        # same (path, mtime) keys as the compiled presets
+        mtimes = []
+        for preset_path in preset_paths:
+            try:
+                mtimes.append(os.stat(preset_path).st_mtime)
+            except OSError:
+                mtimes.append(None)
+
+        key = separator, tuple(zip(preset_paths, mtimes))
+        if key == self._key:
+            return
+        self._key = key
+
+        presets = [(preset, get_preset_assignments(preset_path))
+                   for preset, preset_path in zip(preset_catalog.presets, preset_paths)]
+
+        self.bone_slots.clear()
+        self.slot_counts.clear()
+        for preset, assignments in presets:
+            if not assignments:
+                continue
+
+            slots = set()
+            for attrs, bone_name in assignments:
+                if not bone_name or not isinstance(bone_name, str) or attrs[-1] in NON_BONE_SLOTS:
+                    continue
+
+                slot = '.'.join(attrs)
+                slots.add(slot)
+
+                names = {bone_name}
+                for syn_grp in bone_name_synonyms.get('.'.join(attrs[:2]), ()):
+                    if bone_name in syn_grp:
+                        names.update(syn_grp)
+                for name in names:
+                    self.bone_slots.setdefault(normalize_bone_name(name, separator), set()).add((preset, slot))
+
+            if slots:
+                self.slot_counts[preset] = len(slots)
+
+    def rank(self, bone_names, separator=':'):
+        """Return (preset, coverage, matched slots) of the presets that match any of bone_names,
+        best first. Coverage is the fraction of the preset slots found among the bones"""
+        self.refresh(separator)
+
+        matched = dict()
+        for name in set(normalize_bone_name(name, separator) for name in bone_names):
+            for preset, slot in self.bone_slots.get(name, ()):
+                matched.setdefault(preset, set()).add(slot)
+
+        ranking = [(preset, len(slots) / self.slot_counts[preset], len(slots)) for preset, slots in matched.items()]
+        ranking.sort(key=lambda match: (-match[1], -match[2], match[0]))
+        return ranking
+
+
+preset_index = PresetIndex()
+
+
+def detect_presets(bone_names, separator=':'):
+    """Rank the installed presets by how many of their bones are found in bone_names"""
+    return preset_index.rank(bone_names, separator)
+
+
 def validate_preset(armature_data, separator=':'):
     settings = armature_data.expykit_retarget
     a_name = armature_data.bones[0].name
@@ -138,11 +338,144 @@ def validate_preset(armature_data, separator=':'):
                         trg_finger[slot] = bone_name1
 
 
+# compiled presets by path: (mtime, assignments)
+PRESET_CACHE_SIZE = 32
+_preset_cache = OrderedDict()
+
+
+def _compile_preset(preset_path):
+    """Return the (attribute names, value) pairs assigned to skeleton by a preset file,
+    None if the preset does more than assigning literals"""
+    with open(preset_path) as preset_file:
+        code = ast.parse(preset_file.read())
+
+    assignments = []
+    # skip 'import bpy' and 'skeleton = bpy.context.object.data.expykit_retarget'
+    for node in code.body[2:]:
+        if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+            return None
+
+        target = node.targets[0]
+        attrs = []
+        while isinstance(target, ast.Attribute):
+            attrs.insert(0, target.attr)
+            target = target.value
+
+        if not attrs or not isinstance(target, ast.Name) or target.id != 'skeleton':
+            return None
+
+        try:
+            value = ast.literal_eval(node.value)
+        except ValueError:
+            return None
+
+        assignments.append((tuple(attrs), value))
+
+    return assignments
+
+
+def _is_preset_slot(skeleton, attrs):
+    """Return True if attrs is the path of a single setting of skeleton"""
+    if len(attrs) == 1 and attrs[0] in NON_BONE_SLOTS:
+        return True
+
+    owner = skeleton
+    for attr in attrs:
+        if attr.startswith('_') or not hasattr(owner, attr):
+            return False
+        owner = getattr(owner, attr)
+
+    return owner is None or isinstance(owner, (str, bool, int, float))
+
+
+def _load_json_preset(preset_path):
+    """Return the (attribute names, value) pairs of a .json preset, None if it's not a mapping of slot paths.
+
+    Paths that are not settings of PresetSkeleton are skipped
+    """
+    with open(preset_path) as preset_file:
+        data = json.load(preset_file, object_pairs_hook=OrderedDict)
+
+    if not isinstance(data, dict):
+        return None
+
+    skeleton = PresetSkeleton()
+    assignments = []
+    for path, value in data.items():
+        if not isinstance(value, (str, bool, int, float)):
+            return None
+
+        attrs = tuple(path.split('.'))
+        if not _is_preset_slot(skeleton, attrs):
+            print("Skipping unknown slot {} in preset {}".format(path, preset_path))
+            continue
+        assignments.append((attrs, value))
+
+    return assignments
+
+
+def convert_preset_to_json(preset_path):
+    """Write a .py preset as a .json preset next to it. Return the new path, None if it can't be converted"""
+    assignments = get_preset_assignments(preset_path)
+    if assignments is None:
+        return None
+
+    json_path = os.path.splitext(preset_path)[0] + '.json'
+    with open(json_path, 'w') as json_file:
+        json.dump(OrderedDict(('.'.join(attrs), value) for attrs, value in assignments), json_file, indent=4)
+
+    return json_path
+
+
+def get_preset_assignments(preset_path):
+    """Return the compiled assignments of a preset file, parsed again only if the file has changed.
+
+    None if the file is missing or can't be compiled, and must be executed instead
+    """
+    try:
+        mtime = os.stat(preset_path).st_mtime
+    except OSError:
+        _preset_cache.pop(preset_path, None)
+        return None
+
+    try:
+        cached_mtime, assignments = _preset_cache[preset_path]
+    except KeyError:
+        pass
+    else:
+        if cached_mtime == mtime:
+            _preset_cache.move_to_end(preset_path)
+            return assignments
+
+    try:
+        if preset_path.endswith('.json'):
+            assignments = _load_json_preset(preset_path)
+        else:
+            assignments = _compile_preset(preset_path)
+    except (OSError, SyntaxError, ValueError):
+        assignments = None
+
+    _preset_cache[preset_path] = mtime, assignments
+    while len(_preset_cache) > PRESET_CACHE_SIZE:
+        _preset_cache.popitem(last=False)
+
+    return assignments
+
+
+def apply_preset_assignments(skeleton, assignments):
+    """Set the compiled assignments of a preset on skeleton settings"""
+    for attrs, value in assignments:
+        owner = skeleton
+        for attr in attrs[:-1]:
+            owner = getattr(owner, attr)
+        setattr(owner, attrs[-1], value)
+
+
 def set_preset_skel(preset, validate=True):
     """reads given preset into the active armature's settings"""
     if not preset:
         return
-    if not preset.endswith(".py"):
+    if not preset.endswith(PRESET_EXTENSIONS):
         return
 
     preset_path = os.path.join(get_retarget_dir(), preset)
@@ -151,6 +484,16 @@ def set_preset_skel(preset, validate=True):
 
     settings = bpy.context.active_object.data.expykit_retarget
 
+    assignments = get_preset_assignments(get_preset_path(preset))
+    if assignments is not None:
+        apply_preset_assignments(settings, assignments)
+        if validate:
+            validate_preset(settings.id_data)
+
+        return get_settings_skel(settings)
+    if preset.endswith('.json'):
+        return
+
     if hasattr(importlib.util, "module_from_spec"):
         spec = importlib.util.spec_from_file_location("sel_preset", preset_path)
         preset_mod = importlib.util.module_from_spec(spec)
@@ -174,7 +517,7 @@ def get_preset_skel(preset, settings=None, validate=True):
     """reads given preset into the given settings"""
     if not preset:
         return
-    if not preset.endswith(".py"):
+    if not preset.endswith(PRESET_EXTENSIONS):
         return
 
     preset_path = os.path.join(get_retarget_dir(), preset)
@@ -186,14 +529,20 @@ def get_preset_skel(preset, settings=None, validate=True):
     _new_skeleton = settings is None
     skeleton = settings if settings else PresetSkeleton()
 
-    # HACKISH: executing the preset would apply it to the current armature (target).
-    # We don't want that if this is runnning on the source armature. Using ast instead
-    code = ast.parse(open(preset_path).read())
+    assignments = get_preset_assignments(get_preset_path(preset))
+    if assignments is not None:
+        apply_preset_assignments(skeleton, assignments)
+    elif preset.endswith('.json'):
+        return
+    else:
+        # HACKISH: executing the preset would apply it to the current armature (target).
+        # We don't want that if this is runnning on the source armature. Using ast instead
+        code = ast.parse(open(preset_path).read())
 
-    # remove skeleton
-    code.body.pop(0)  # remove line 'import bpy' from preset
-    code.body.pop(0)  # remove line 'skeleton = bpy.context.object.data.expykit_retarget' from preset
-    eval(compile(code, '', 'exec'))
+        # remove skeleton
+        code.body.pop(0)  # remove line 'import bpy' from preset
+        code.body.pop(0)  # remove line 'skeleton = bpy.context.object.data.expykit_retarget' from preset
+        eval(compile(code, '', 'exec'))
 
     if settings and validate:
         validate_preset(settings.id_data)
@@ -270,6 +619,9 @@ class PresetFinger:
 class PresetSkeleton:
     def __init__(self):
         self.face = SimpleFace()
+        # eyelid slots of the face settings, presets can assign them
+        self.face.right_upLid = ""
+        self.face.left_upLid = ""
         self.spine = HumanSpine()
 
         self.left_arm = HumanArm()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# anim_utils and fbx_helper have no relative imports: load them as top level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
@@ -0,0 +1,35 @@
+import math
+
+import numpy
+import pytest
+
+bpy = pytest.importorskip("bpy")
+import anim_utils
+
+
+@pytest.fixture
+def fcurve():
+    action = bpy.data.actions.new("reduce_test")
+    yield action.fcurves.new("location", index=0)
+    bpy.data.actions.remove(action)
+
+
+def test_reduce_baked_bezier_keeps_integer_frames(fcurve):
+    # keys inserted one per frame, as a bake does, default to BEZIER
+    for frame in range(1, 101):
+        fcurve.keyframe_points.insert(frame, math.sin(frame / 10.0))
+    fcurve.update()
+    assert fcurve.keyframe_points[0].interpolation == 'BEZIER'
+
+    before, after, max_error = anim_utils.reduce_fcurve(fcurve, 0.01)
+
+    assert before == 100
+    assert after < before
+    assert max_error <= 0.01
+
+    co = numpy.empty(2 * after, dtype=numpy.float32)
+    fcurve.keyframe_points.foreach_get('co', co)
+    frames = co[0::2]
+    assert numpy.array_equal(frames, numpy.round(frames))
+    assert set(frames).issubset(range(1, 101))
+    assert all(key_point.interpolation == 'LINEAR' for key_point in fcurve.keyframe_points)
@@ -0,0 +1,72 @@
+import struct
+
+import pytest
+
+pytest.importorskip("io_scene_fbx.fbx_utils")
+import fbx_helper
+
+
+def _node(name, props, children, offset):
+    """Binary FBX 7.5 node record, props are (type code, packed value) pairs"""
+    header_size = 25
+    props_data = b''.join(code + value for code, value in props)
+    start = offset + header_size + len(name) + len(props_data)
+
+    body = b''
+    for child in children:
+        body += _node(*child, offset=start + len(body))
+    if children:
+        body += b'\0' * header_size
+
+    end = start + len(body)
+    return struct.pack('<QQQB', end, len(props), len(props_data), len(name)) + name + props_data + body
+
+
+def _fbx_file(nodes):
+    data = fbx_helper.FBX_BINARY_MAGIC + b'\x1a\x00' + struct.pack('<I', 7500)
+    for node in nodes:
+        data += _node(*node, offset=len(data))
+
+    return data + b'\0' * (25 + 160)
+
+
+def _long(value):
+    return b'L', struct.pack('<q', value)
+
+
+def _string(value):
+    return b'S', struct.pack('<I', len(value)) + value
+
+
+TAKES = [(b'Takes', [], [(b'Take', [_string(b'take')], [(b'ReferenceTime', [_long(0), _long(46186158000)], [])])])]
+
+
+def test_read_take_time(tmp_path):
+    fbx_path = tmp_path / "good.fbx"
+    fbx_path.write_bytes(_fbx_file([(b'GlobalSettings', [], [])] + TAKES))
+
+    assert fbx_helper.get_fbx_local_time(str(fbx_path)) == [0, 46186158000]
+
+
+def test_truncated_file_is_skipped(tmp_path):
+    data = _fbx_file([(b'GlobalSettings', [], [])] + TAKES)
+    good_path = tmp_path / "good.fbx"
+    good_path.write_bytes(data)
+    truncated_path = tmp_path / "truncated.fbx"
+    # cut within the Takes node
+    truncated_path.write_bytes(data[:-(25 + 160 + 20)])
+
+    assert fbx_helper.read_fbx_metadata(str(truncated_path)) is None
+
+    times = dict(fbx_helper.scan_local_times([str(good_path), str(truncated_path)], max_workers=2))
+    assert times == {str(good_path): [0, 46186158000], str(truncated_path): None}
+
+
+def test_backward_end_offset_does_not_loop(tmp_path):
+    data = bytearray(_fbx_file(TAKES))
+    # end offset of the first node points back to its own start
+    struct.pack_into('<Q', data, fbx_helper.FBX_HEADER_SIZE, fbx_helper.FBX_HEADER_SIZE)
+    fbx_path = tmp_path / "corrupt.fbx"
+    fbx_path.write_bytes(bytes(data))
+
+    assert fbx_helper.read_fbx_metadata(str(fbx_path)) is None
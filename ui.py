@@ -86,6 +86,10 @@ class AnimMenu(bpy.types.Menu):
         row = layout.row()
         row.operator(operators.BakeConstrainedActions.bl_idname)
 
+        row = layout.row()
+        row.operator_context = 'INVOKE_DEFAULT'
+        row.operator(operators.BakeConstrainedActionsModal.bl_idname)
+
         row = layout.row()
         row.operator_context = 'INVOKE_DEFAULT'
         row.operator(operators.RenameActionsFromFbxFiles.bl_idname)
@@ -334,7 +338,17 @@ class ExecutePresetArmatureRetarget(Operator):
         preset_class.filepath = self.filepath
         # in 2.7x there is no callbacks, so we call them manually
         preset_class.reset_cb_va(context)
-        _ = ExecutePreset.execute(self, context)
+
+        # a .json preset converted from this one takes precedence, as in preset_handler.get_preset_path
+        from os.path import basename
+        preset_path = preset_handler.get_preset_path(basename(self.filepath))
+        assignments = preset_handler.get_preset_assignments(preset_path) if preset_path.endswith('.json') else None
+        if assignments is not None:
+            preset_handler.apply_preset_assignments(context.object.data.expykit_retarget, assignments)
+            _ = {'FINISHED'}
+        else:
+            _ = ExecutePreset.execute(self, context)
+
         preset_class.post_cb_va(context)
         return _
 
@@ -378,7 +392,17 @@ class AddPresetArmatureRetarget(AddPresetBase, Operator):
         # passing filepath (basename, not full) via the menu
         preset_class = getattr(bpy.types, self.preset_menu)
         preset_class.filepath = self.as_filename(self.name) + ".py"
-        return super().execute(context)
+        result = super().execute(context)
+
+        if not self.remove_active:
+            # keep the .json preset converted from this one, which takes precedence, up to date
+            from os.path import join, splitext, isfile
+            preset_path = join(preset_handler.get_retarget_dir(), preset_class.filepath)
+            if isfile(splitext(preset_path)[0] + '.json'):
+                preset_handler.convert_preset_to_json(preset_path)
+
+        preset_handler.preset_catalog.reload()
+        return result
 
     def invoke(self, context, _event):
         from os.path import splitext
@@ -411,6 +435,38 @@ class ClearArmatureRetarget(Operator):
         return {'FINISHED'}
 
 
+class ApplyDetectedPreset(Operator):
+    """Apply the retarget preset that best matches the bones of active skeleton"""
+    bl_idname = "object.expy_kit_armature_preset_detect"
+    bl_label = "Detect Retarget Preset"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        if not context.object:
+            return False
+        if context.object.type != 'ARMATURE':
+            return False
+
+        return True
+
+    def execute(self, context):
+        from os.path import splitext
+        ranking = preset_handler.detect_presets(context.object.data.bones.keys())
+        if not ranking:
+            self.report({'WARNING'}, "No preset matches the bones of {}".format(context.object.name))
+            return {'CANCELLED'}
+
+        preset, coverage, _ = ranking[0]
+        skeleton = context.object.data.expykit_retarget
+        preset_handler.reset_skeleton(skeleton)
+        preset_handler.set_preset_skel(preset)
+        skeleton.last_used_preset = preset
+
+        self.report({'INFO'}, "{} applied, {:.0%} of its bones found".format(splitext(preset)[0], coverage))
+        return {'FINISHED'}
+
+
 @make_annotations
 class SetToActiveBone(Operator):
     """Set adjacent UI entry to active bone"""
@@ -772,6 +828,10 @@ if bpy.app.version >= (2, 79, 0):
             row = layout.row()
             row.operator(operators.BakeConstrainedActions.bl_idname)
 
+            row = layout.row()
+            row.operator_context = 'INVOKE_DEFAULT'
+            row.operator(operators.BakeConstrainedActionsModal.bl_idname)
+
             row = layout.row()
             row.operator_context = 'INVOKE_DEFAULT'
             row.operator(operators.RenameActionsFromFbxFiles.bl_idname)
@@ -853,6 +913,7 @@ class VIEW3D_PT_expy_retarget(RetargetBasePanel, bpy.types.Panel):
         row = split.row(align=True)
         row.operator(AddPresetArmatureRetarget.bl_idname, text="+")
         row.operator(AddPresetArmatureRetarget.bl_idname, text="-").remove_active = True
+        layout.operator(ApplyDetectedPreset.bl_idname)
 
 
 class VIEW3D_PT_expy_retarget_face(RetargetBasePanel, bpy.types.Panel):
@@ -1083,6 +1144,7 @@ def register_classes():
                                                           description="This armature will drive another one.")
 
     bpy.utils.register_class(ClearArmatureRetarget)
+    bpy.utils.register_class(ApplyDetectedPreset)
     bpy.utils.register_class(VIEW3D_MT_retarget_presets)
     bpy.utils.register_class(MenuItemOperator)
     bpy.utils.register_class(VIEW3D_MT_DeformPreset)
@@ -1135,6 +1197,7 @@ def unregister_classes():
     bpy.utils.unregister_class(AddPresetArmatureRetarget)
     bpy.utils.unregister_class(ExecutePresetArmatureRetarget)
     bpy.utils.unregister_class(ClearArmatureRetarget)
+    bpy.utils.unregister_class(ApplyDetectedPreset)
 
     if bpy.app.version < (2, 80):
         bpy.types.VIEW3D_MT_pose_specials.remove(pose_context_options)